@@ -0,0 +1,50 @@
+# analysis_worker.py — run analyze_library() off the GUI thread
+import time
+import threading
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class AnalysisWorker(QThread):
+    """
+    Background audio analysis (loudness + waveform overviews).
+    progress(dict) -> {"done", "total", "tracks_per_sec", "current"}
+    analyzed(dict) -> metadata delta for each committed batch
+    finished_analysis(dict) -> analyze_library() result
+    failed(str) -> error message
+    """
+
+    progress = pyqtSignal(dict)
+    analyzed = pyqtSignal(dict)
+    finished_analysis = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    PROGRESS_INTERVAL = 0.5
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._cancel = threading.Event()
+        self._last_emit = 0.0
+
+    def cancel(self):
+        """Stop after the files in flight; finished ones are still saved."""
+        self._cancel.set()
+
+    def _on_progress(self, stats):
+        now = time.monotonic()
+        if now - self._last_emit >= self.PROGRESS_INTERVAL:
+            self._last_emit = now
+            self.progress.emit(stats)
+
+    def run(self):
+        try:
+            from audio_analysis import analyze_library
+            result = analyze_library(
+                progress=self._on_progress,
+                cancel=self._cancel,
+                on_commit=self.analyzed.emit,
+            )
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished_analysis.emit(result)
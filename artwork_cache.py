@@ -0,0 +1,78 @@
+# artwork_cache.py — content-addressed artwork + precomputed thumbnails
+import os
+import threading
+
+from config import LOCAL_DIR, THUMBNAIL_DIR
+
+
+# ----------------------------------------------------------
+# Fixed thumbnail sizes generated once at scan time
+# ----------------------------------------------------------
+THUMBNAIL_SIZES = {
+    "list": (80, 60),      # LibraryTab rows
+    "player": (200, 200),  # PlayerTab album art
+}
+
+
+def thumbnail_path(key, size):
+    """Absolute path of the (w, h) thumbnail for artwork key."""
+    w, h = size
+    return os.path.join(THUMBNAIL_DIR, f"{key}_{w}x{h}.jpg")
+
+
+def thumbnails_exist(key):
+    return all(os.path.exists(thumbnail_path(key, s)) for s in THUMBNAIL_SIZES.values())
+
+
+def atomic_save_jpeg(img, full_path):
+    # unique temp name so parallel workers never see a half-written file
+    tmp_path = f"{full_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    img.save(tmp_path, "JPEG", quality=85)
+    os.replace(tmp_path, full_path)
+
+
+def make_thumbnails(img, key):
+    """Write every THUMBNAIL_SIZES variant of a decoded PIL image."""
+    img = img.convert("RGB")
+    for size in THUMBNAIL_SIZES.values():
+        thumb = img.copy()
+        thumb.thumbnail(size)
+        atomic_save_jpeg(thumb, thumbnail_path(key, size))
+
+
+# ----------------------------------------------------------
+# Lookup: smallest cached image that still covers the request
+# ----------------------------------------------------------
+def best_artwork_path(art_rel, width, height):
+    """
+    Return the absolute path of the best image to display art_rel at
+    width x height: the smallest thumbnail at least that big, else the
+    full-size cached image. Returns '' when nothing is cached.
+    """
+    if not art_rel:
+        return ""
+    full_path = art_rel if os.path.isabs(art_rel) else os.path.join(LOCAL_DIR, art_rel)
+    key = os.path.splitext(os.path.basename(full_path))[0]
+
+    for size in sorted(THUMBNAIL_SIZES.values(), key=lambda s: s[0] * s[1]):
+        if size[0] >= width and size[1] >= height:
+            path = thumbnail_path(key, size)
+            if os.path.exists(path):
+                return path
+
+    return full_path if os.path.exists(full_path) else ""
+
+
+# ----------------------------------------------------------
+# Removal (full image + its thumbnails)
+# ----------------------------------------------------------
+def remove_artwork(art_rel):
+    full_path = os.path.join(LOCAL_DIR, art_rel)
+    key = os.path.splitext(os.path.basename(full_path))[0]
+    targets = [full_path] + [thumbnail_path(key, s) for s in THUMBNAIL_SIZES.values()]
+    for path in targets:
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except Exception:
+                pass
@@ -0,0 +1,395 @@
+# audio_analysis.py — background loudness + waveform analysis
+#
+# Tracks are decoded to 16-bit PCM with pygame (the same decoder that
+# plays them), then measured with vectorised NumPy: BS.1770 K-weighting
+# applied block by block (FFT overlap-save), 400 ms gating blocks and the
+# absolute / relative gates. Results are stored on each metadata entry:
+#   loudness         integrated loudness, LUFS (None if silent/undecodable)
+#   peak             sample peak, 0..1
+#   loudness_blocks  gated block count (weights the album average)
+#   loudness_key     "<file_size>:<mtime_ns>" the analysis belongs to
+#   album_loudness   block-weighted loudness of the whole album
+#   waveform         seek-bar overview, .npy path relative to LOCAL_DIR
+import os
+import time
+import hashlib
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from config import (
+    LOCAL_DIR,
+    WAVEFORM_DIR,
+    WAVEFORM_BINS,
+    LOUDNESS_WORKERS,
+    LOUDNESS_COMMIT_SECONDS,
+    LOUDNESS_JSON_COMMIT_SECONDS,
+    REPLAYGAIN_MODE,
+    REPLAYGAIN_REFERENCE_LUFS,
+    REPLAYGAIN_PREAMP_DB,
+)
+from metadata_store import open_metadata_store, JSONMetadataStore
+
+
+DECODE_RATE = 44100
+KWEIGHT_TAPS = 4096           # FIR length approximating the K-weighting IIR
+FFT_SIZE = 1 << 16            # overlap-save block size
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+
+# ----------------------------------------------------------
+# Decoding (runs inside the worker processes)
+# ----------------------------------------------------------
+def _init_decoder():
+    """Pool initializer: a mixer with no audio device, only used to decode."""
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+    import pygame
+    pygame.mixer.init(frequency=DECODE_RATE, size=-16, channels=2)
+
+
+def decode_pcm(path):
+    """(int16 array of shape (samples, channels), sample_rate) or None."""
+    import pygame
+    if not pygame.mixer.get_init():
+        _init_decoder()
+    rate = pygame.mixer.get_init()[0]
+    try:
+        sound = pygame.mixer.Sound(path)
+    except Exception:
+        return None
+    pcm = pygame.sndarray.array(sound)
+    if pcm.ndim == 1:
+        pcm = pcm[:, None]
+    return pcm, rate
+
+
+# ----------------------------------------------------------
+# Loudness (vectorised over PCM blocks)
+# ----------------------------------------------------------
+@lru_cache(maxsize=4)
+def _k_weighting_fir(rate):
+    """FIR approximation of the BS.1770 pre-filter + RLB high-pass at rate."""
+    # shelving stage
+    f0, gain, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = np.tan(np.pi * f0 / rate)
+    vh = 10 ** (gain / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    b1 = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0]
+    a1 = [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    # high-pass stage
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = np.tan(np.pi * f0 / rate)
+    a0 = 1 + k / q + k * k
+    b2 = [1.0, -2.0, 1.0]
+    a2 = [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+
+    n = KWEIGHT_TAPS * 4
+    z = np.exp(-1j * 2 * np.pi * np.fft.rfftfreq(n))
+    response = np.ones_like(z)
+    for b, a in ((b1, a1), (b2, a2)):
+        response *= (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+    return np.fft.irfft(response, n)[:KWEIGHT_TAPS]
+
+
+def _segment_energy(channel, fir, segment):
+    """Sum of squared K-weighted samples per `segment`-sample slice."""
+    m = len(fir)
+    step = FFT_SIZE - m + 1
+    fir_spectrum = np.fft.rfft(fir, FFT_SIZE)
+    padded = np.concatenate([np.zeros(m - 1, dtype=np.float32), channel])
+    filtered = np.empty(len(channel), dtype=np.float32)
+    for start in range(0, len(channel), step):
+        block = np.fft.irfft(np.fft.rfft(padded[start:start + FFT_SIZE], FFT_SIZE) * fir_spectrum)
+        chunk = block[m - 1:m - 1 + min(step, len(channel) - start)]
+        filtered[start:start + len(chunk)] = chunk
+    count = len(filtered) // segment
+    squared = np.square(filtered[:count * segment], dtype=np.float64)
+    return squared.reshape(count, segment).sum(axis=1)
+
+
+def _lufs(mean_square):
+    return -0.691 + 10 * np.log10(mean_square)
+
+
+def measure_loudness(pcm, rate):
+    """{"loudness", "peak", "loudness_blocks"} for int16 PCM."""
+    peak = float(np.abs(pcm.astype(np.int32)).max()) / 32768 if len(pcm) else 0.0
+    segment = rate // 10                      # 100 ms; blocks are 4 segments
+    fir = _k_weighting_fir(rate)
+
+    energy = None
+    for c in range(pcm.shape[1]):
+        channel = pcm[:, c].astype(np.float32) / 32768
+        seg = _segment_energy(channel, fir, segment)
+        energy = seg if energy is None else energy + seg
+
+    result = {"loudness": None, "peak": round(peak, 5), "loudness_blocks": 0}
+    if energy is None or len(energy) < 4:
+        return result
+
+    # 400 ms blocks with 75 % overlap via a running sum over segments
+    cumulative = np.concatenate([[0.0], np.cumsum(energy)])
+    blocks = (cumulative[4:] - cumulative[:-4]) / (4 * segment)
+    with np.errstate(divide="ignore"):
+        levels = _lufs(blocks)
+    gated = blocks[levels > ABSOLUTE_GATE_LUFS]
+    if not len(gated):
+        return result
+    relative_gate = _lufs(gated.mean()) + RELATIVE_GATE_LU
+    gated = gated[_lufs(gated) > relative_gate]
+
+    result["loudness"] = round(float(_lufs(gated.mean())), 2)
+    result["loudness_blocks"] = int(len(gated))
+    return result
+
+
+# ----------------------------------------------------------
+# Waveform overview (peak / RMS per bin, memory-mapped at play time)
+# ----------------------------------------------------------
+def compute_waveform(pcm, bins=WAVEFORM_BINS):
+    """uint8 array of shape (bins, 2): per-bin peak and RMS, scaled to 0..255."""
+    mono = np.abs(pcm.astype(np.float32).mean(axis=1)) / 32768
+    if len(mono) < bins:
+        mono = np.pad(mono, (0, bins - len(mono)))
+    edges = np.linspace(0, len(mono), bins + 1).astype(np.int64)[:-1]
+    counts = np.diff(np.append(edges, len(mono)))
+    peak = np.maximum.reduceat(mono, edges)
+    rms = np.sqrt(np.add.reduceat(np.square(mono, dtype=np.float64), edges) / counts)
+    overview = np.stack([peak, rms], axis=1)
+    return np.clip(np.round(overview * 255), 0, 255).astype(np.uint8)
+
+
+def waveform_path(key):
+    """Relative .npy path for a track's overview (key: content_id or path)."""
+    name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.relpath(os.path.join(WAVEFORM_DIR, f"{name}.npy"), LOCAL_DIR)
+
+
+def save_waveform(overview, rel_path):
+    full_path = os.path.join(LOCAL_DIR, rel_path)
+    tmp_path = f"{full_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, overview)
+    os.replace(tmp_path, full_path)
+
+
+def load_waveform(entry):
+    """Memory-mapped (bins, 2) overview for entry, or None. Never decodes audio."""
+    rel_path = (entry or {}).get("waveform")
+    if not rel_path:
+        return None
+    try:
+        return np.load(os.path.join(LOCAL_DIR, rel_path), mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+
+def analyze_file(path, waveform_key=None):
+    """
+    (path, measurement or None): loudness plus the waveform overview, from
+    one decode. Top-level so process pools can pickle it.
+    """
+    try:
+        decoded = decode_pcm(path)
+        if decoded is None:
+            return path, None
+        pcm, rate = decoded
+        measured = measure_loudness(pcm, rate)
+        rel_path = waveform_path(waveform_key or path)
+        save_waveform(compute_waveform(pcm), rel_path)
+        measured["waveform"] = rel_path
+        return path, measured
+    except Exception:
+        return path, None
+
+
+# ----------------------------------------------------------
+# Store bookkeeping
+# ----------------------------------------------------------
+def analysis_key(entry):
+    return f"{entry.get('file_size')}:{entry.get('mtime_ns')}"
+
+
+def needs_analysis(entry):
+    return entry.get("loudness_key") != analysis_key(entry) or "waveform" not in entry
+
+
+def album_key(entry):
+    return (entry.get("album_artist", ""), entry.get("album", ""))
+
+
+def _album_loudness(entries):
+    """Block-weighted mean loudness of already analysed tracks."""
+    energy = blocks = 0.0
+    for entry in entries:
+        n = entry.get("loudness_blocks") or 0
+        if entry.get("loudness") is not None and n:
+            energy += n * 10 ** ((entry["loudness"] + 0.691) / 10)
+            blocks += n
+    return round(float(_lufs(energy / blocks)), 2) if blocks else None
+
+
+def _commit_results(results):
+    """Write measurements (path -> result) into the store; returns a metadata delta."""
+    from tag_extractor import SCAN_LOCK, remove_unreferenced_waveforms
+
+    with SCAN_LOCK:
+        store = open_metadata_store()
+        try:
+            metadata = store.load_all()
+            if not isinstance(metadata, dict):
+                metadata = {}
+
+            changed, albums, stale_waves = set(), set(), set()
+            for path, (key, measured) in results.items():
+                entry = metadata.get(path)
+                # the file was retagged / replaced since it was queued
+                if entry is None or analysis_key(entry) != key:
+                    continue
+                # a new content_id means a new overview file
+                stale_waves.add(entry.get("waveform", ""))
+                entry.update(measured or {
+                    "loudness": None, "peak": None, "loudness_blocks": 0, "waveform": "",
+                })
+                entry["loudness_key"] = key
+                changed.add(path)
+                albums.add(album_key(entry))
+
+            by_album = {}
+            for path, entry in metadata.items():
+                if album_key(entry) in albums:
+                    by_album.setdefault(album_key(entry), []).append(path)
+            for paths in by_album.values():
+                value = _album_loudness(metadata[p] for p in paths)
+                for p in paths:
+                    if metadata[p].get("album_loudness") != value:
+                        metadata[p]["album_loudness"] = value
+                        changed.add(p)
+
+            if changed:
+                store.commit(metadata, changed=sorted(changed), removed=())
+                remove_unreferenced_waveforms(stale_waves, metadata)
+        finally:
+            store.close()
+
+    return {"upserts": {p: metadata[p] for p in changed}, "removed": []}
+
+
+# ----------------------------------------------------------
+# PUBLIC FUNCTION:
+# Analyse every track that has no current measurement
+# ----------------------------------------------------------
+def analyze_library(workers=None, progress=None, cancel=None, on_commit=None):
+    """
+    Measure loudness and build waveform overviews for tracks that are new
+    or changed since their last analysis, in a process pool of `workers` (default LOUDNESS_WORKERS).
+    At most two files per worker are in flight, so decoded PCM never
+    piles up in memory. Results are committed every
+    LOUDNESS_COMMIT_SECONDS (LOUDNESS_JSON_COMMIT_SECONDS for the JSON
+    store, which is rewritten whole) and at the end; on_commit(delta)
+    receives each committed {"upserts": {...}, "removed": []} batch.
+
+    progress(stats) gets {"done", "total", "tracks_per_sec", "current"}.
+    """
+    workers = max(1, workers or LOUDNESS_WORKERS)
+    store = open_metadata_store()
+    try:
+        metadata = store.load_all()
+        commit_seconds = (
+            LOUDNESS_JSON_COMMIT_SECONDS if isinstance(store, JSONMetadataStore)
+            else LOUDNESS_COMMIT_SECONDS
+        )
+    finally:
+        store.close()
+    if not isinstance(metadata, dict):
+        metadata = {}
+
+    todo = [(p, analysis_key(e)) for p, e in sorted(metadata.items()) if needs_analysis(e)]
+    keys = dict(todo)
+    # overviews are keyed by content, so moved files keep theirs
+    waveform_keys = {p: metadata[p].get("content_id") or p for p, _ in todo}
+    stats = {"done": 0, "total": len(todo), "tracks_per_sec": 0.0, "current": ""}
+    started = last_commit = time.monotonic()
+    batch = {}
+    committed = 0
+
+    def flush():
+        nonlocal batch, committed
+        if batch:
+            delta = _commit_results(batch)
+            committed += len(batch)
+            batch = {}
+            if on_commit and delta["upserts"]:
+                on_commit(delta)
+
+    def cancelled():
+        return cancel is not None and cancel.is_set()
+
+    if todo:
+        # always processes, even for one worker: decoding and NumPy stay out of the GUI process
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_decoder)
+        try:
+            queue = iter(todo)
+            in_flight = set()
+            while True:
+                while len(in_flight) < workers * 2 and not cancelled():
+                    item = next(queue, None)
+                    if item is None:
+                        break
+                    in_flight.add(pool.submit(analyze_file, item[0], waveform_keys[item[0]]))
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path, measured = future.result()
+                    batch[path] = (keys[path], measured)
+                    stats["done"] += 1
+                    stats["current"] = path
+                elapsed = time.monotonic() - started
+                stats["tracks_per_sec"] = round(stats["done"] / elapsed, 2) if elapsed else 0.0
+                if progress:
+                    progress(dict(stats))
+                if time.monotonic() - last_commit >= commit_seconds:
+                    flush()
+                    last_commit = time.monotonic()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            flush()
+
+    elapsed = time.monotonic() - started
+    return {
+        "analyzed": committed,
+        "total": len(todo),
+        "cancelled": committed < len(todo),
+        "elapsed_s": round(elapsed, 2),
+        "tracks_per_sec": round(committed / elapsed, 2) if elapsed and committed else 0.0,
+    }
+
+
+# ----------------------------------------------------------
+# Playback gain
+# ----------------------------------------------------------
+def replay_gain_volume(entry, mode=None):
+    """
+    Mixer volume (0..1) that brings entry to REPLAYGAIN_REFERENCE_LUFS.
+    pygame can only attenuate, so quiet tracks play at full volume; the
+    peak keeps the result from clipping. 1.0 when unanalysed or "off".
+    """
+    mode = mode or REPLAYGAIN_MODE
+    if mode == "off" or not entry:
+        return 1.0
+    loudness = entry.get("album_loudness") if mode == "album" else None
+    if loudness is None:
+        loudness = entry.get("loudness")
+    if loudness is None:
+        return 1.0
+
+    volume = 10 ** ((REPLAYGAIN_REFERENCE_LUFS - loudness + REPLAYGAIN_PREAMP_DB) / 20)
+    peak = entry.get("peak") or 0
+    if peak > 0:
+        volume = min(volume, 1.0 / peak)
+    return max(0.0, min(1.0, volume))
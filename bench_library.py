@@ -0,0 +1,365 @@
+# bench_library.py — synthetic library generator + scan/load benchmarks
+#
+# Usage:
+#   python bench_library.py --tracks 5000 --artists 200 --albums-per-artist 3
+#   python bench_library.py --tracks 80000 --output bench_output.txt
+#   python bench_library.py --memory-only --memory-tracks 100000
+#
+# Everything (music, metadata, artwork cache) lives in a temp dir; your
+# real AppData files are never touched. Results are printed as JSON.
+import os
+import sys
+import json
+import time
+import random
+import struct
+import shutil
+import argparse
+import tempfile
+from io import BytesIO
+
+
+# ----------------------------------------------------------
+# Isolate AppData *before* config.py is imported anywhere
+# ----------------------------------------------------------
+def _isolate_environment(work_dir):
+    for var in ("APPDATA", "LOCALAPPDATA", "USERPROFILE", "HOME"):
+        path = os.path.join(work_dir, var.lower())
+        os.makedirs(path, exist_ok=True)
+        os.environ[var] = path
+    # list population needs a QApplication, not a visible window
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+# ----------------------------------------------------------
+# Synthetic audio files
+# ----------------------------------------------------------
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz frame: 4-byte header + 413 bytes
+MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0x64]) + b"\0" * 413
+
+
+def _flac_streaminfo(seconds):
+    sample_rate, channels, bits = 44100, 2, 16
+    packed = (sample_rate << 44) | ((channels - 1) << 41) | ((bits - 1) << 36) | (sample_rate * seconds)
+    body = struct.pack(">HH", 4096, 4096) + b"\0" * 6 + packed.to_bytes(8, "big") + b"\0" * 16
+    return b"fLaC" + bytes([0x80, 0, 0, len(body)]) + body
+
+
+def _make_artwork(size, seed):
+    from PIL import Image
+    rnd = random.Random(seed)
+    # noise keeps JPEG sizes realistic instead of compressing to nothing
+    img = Image.frombytes("RGB", (size, size), rnd.randbytes(size * size * 3))
+    buf = BytesIO()
+    img.save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+def generate_library(root, tracks, artists, albums_per_artist, art_size, flac_ratio, seed=1):
+    """Write a tagged library under root. Returns number of files written."""
+    from mutagen.id3 import ID3, TIT2, TPE2, TALB, TRCK, TPOS, TDRC, TCON, TCOM, APIC
+    from mutagen.flac import FLAC, Picture
+
+    rnd = random.Random(seed)
+    albums = artists * albums_per_artist
+    per_album = max(1, tracks // albums)
+    genres = ["Jazz", "Classical", "Rock", "Electronic", "Folk"]
+    written = 0
+
+    for a in range(artists):
+        artist = f"Artist {a:05d}"
+        for b in range(albums_per_artist):
+            if written >= tracks:
+                return written
+            album = f"Album {b:03d}"
+            folder = os.path.join(root, artist, album)
+            os.makedirs(folder, exist_ok=True)
+            art = _make_artwork(art_size, seed=a * 1000 + b) if art_size else b""
+            year = str(1950 + rnd.randrange(70))
+            genre = rnd.choice(genres)
+
+            for t in range(per_album):
+                if written >= tracks:
+                    return written
+                title = f"Track {t + 1:02d}"
+                number = f"{t + 1}/{per_album}"
+
+                if rnd.random() < flac_ratio:
+                    path = os.path.join(folder, f"{t + 1:02d} - {title}.flac")
+                    with open(path, "wb") as f:
+                        f.write(_flac_streaminfo(180))
+                    audio = FLAC(path)
+                    audio.update({
+                        "title": title, "albumartist": artist, "album": album,
+                        "tracknumber": number, "discnumber": "1/1", "date": year,
+                        "genre": genre, "composer": f"Composer {a % 50}",
+                    })
+                    if art:
+                        pic = Picture()
+                        pic.type, pic.mime, pic.data = 3, "image/jpeg", art
+                        audio.add_picture(pic)
+                    audio.save()
+                else:
+                    path = os.path.join(folder, f"{t + 1:02d} - {title}.mp3")
+                    with open(path, "wb") as f:
+                        f.write(MP3_FRAME * 40)
+                    tags = ID3()
+                    tags.add(TIT2(encoding=3, text=title))
+                    tags.add(TPE2(encoding=3, text=artist))
+                    tags.add(TALB(encoding=3, text=album))
+                    tags.add(TRCK(encoding=3, text=number))
+                    tags.add(TPOS(encoding=3, text="1/1"))
+                    tags.add(TDRC(encoding=3, text=year))
+                    tags.add(TCON(encoding=3, text=genre))
+                    tags.add(TCOM(encoding=3, text=f"Composer {a % 50}"))
+                    if art:
+                        tags.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="", data=art))
+                    tags.save(path)
+                written += 1
+
+    return written
+
+
+# ----------------------------------------------------------
+# Benchmarks
+# ----------------------------------------------------------
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def _settle_folders(root, age_s=60):
+    """
+    Backdate folder mtimes. The walker only trusts a folder's cached listing
+    once its mtime is older than MTIME_SETTLE_NS, and a freshly generated
+    library is all newer than that, so the warm rescan would relist everything.
+    """
+    then = time.time() - age_s
+    for d, _, _ in os.walk(root):
+        os.utime(d, (then, then))
+
+
+def run_benchmarks(music_dir, workers, use_processes):
+    from tag_extractor import rebuild_music_metadata
+    from metadata_store import open_metadata_store
+
+    results = {}
+    _settle_folders(music_dir)
+
+    secs, scan = _timed(rebuild_music_metadata, workers, use_processes, music_dir=music_dir)
+    results["cold_scan_s"] = secs
+    results["cold_scan"] = scan
+
+    secs, scan = _timed(rebuild_music_metadata, workers, use_processes, music_dir=music_dir)
+    results["warm_rescan_s"] = secs
+    results["warm_rescan"] = scan
+    # the warm rescan must take the pruned path, or it measures a second cold walk
+    assert scan["dirs_listed"] < results["cold_scan"]["dirs_listed"], (
+        f"warm rescan relisted {scan['dirs_listed']} of {scan.get('dirs_total')} folders"
+    )
+
+    def load():
+        store = open_metadata_store()
+        try:
+            return store.load_all()
+        finally:
+            store.close()
+
+    secs, metadata = _timed(load)
+    results["metadata_load_s"] = secs
+    results["tracks"] = len(metadata)
+
+    # Qt side: LibraryTab grouping + artist list population
+    from PyQt5.QtWidgets import QApplication
+    from library_tab import LibraryTab
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    tab = LibraryTab(music_dir, lambda p: None, lambda p: None)
+
+    secs_reload, _ = _timed(tab.reload_metadata)
+    secs_populate, _ = _timed(tab.populate_artists)
+    results["index_build_s"] = max(0.0, secs_reload - secs_populate)
+    results["populate_artists_s"] = secs_populate
+    results["artists"] = len(tab.tracks.artists())
+
+    tab.deleteLater()
+    app.processEvents()
+    return results
+
+
+# ----------------------------------------------------------
+# In-memory track store footprint
+# ----------------------------------------------------------
+def synthetic_metadata(tracks, artists, albums_per_artist, seed=1):
+    """
+    {path: entry} shaped like the scanner's output, round-tripped through
+    JSON so repeated values are separate objects, as after a real load.
+    """
+    rnd = random.Random(seed)
+    genres = ["Rock", "Jazz", "Electronic", "Hip-Hop", "Classical", "Folk", "Metal", "Pop"]
+    metadata = {}
+    for i in range(tracks):
+        a = i % artists
+        b = (i // artists) % albums_per_artist
+        path = f"C:\\Music\\Artist {a:04d}\\Album {b:02d}\\{i:06d} - Track {i}.mp3"
+        size = rnd.randint(3_000_000, 12_000_000)
+        metadata[path] = {
+            "title": f"Track {i}",
+            "album_artist": f"Artist {a:04d}",
+            "album": f"Album {a:04d}-{b:02d}",
+            "publisher": "Synthetic Records",
+            "disc_number": "1/1",
+            "track_number": f"{i % 12 + 1}/12",
+            "total_discs": "1",
+            "year": str(1970 + a % 50),
+            "genre": genres[a % len(genres)],
+            "composer": f"Composer {a:04d}",
+            "artwork": f"cache/artwork/{a:04d}{b:02d}{'0' * 34}.jpg",
+            "duration": rnd.uniform(120, 420),
+            "bitrate": 320000,
+            "sample_rate": 44100,
+            "channels": 2,
+            "codec": "mp3",
+            "content_id": f"{size}:{rnd.getrandbits(96):024x}",
+            "file_size": size,
+            "mtime_ns": 1_700_000_000_000_000_000 + i,
+        }
+    return json.loads(json.dumps(metadata))
+
+
+def measure_memory(tracks, artists, albums_per_artist):
+    """
+    Bytes held by the old per-tab dict copies (PlayerTab's {path: entry}
+    plus LibraryTab's [{"path": p, **entry}] and its groupings) versus
+    one shared TrackTable, for the same synthetic library.
+    """
+    import gc
+    import tracemalloc
+    from collections import defaultdict
+    from track_store import TrackTable
+
+    def held(build):
+        # whatever survives after the raw load is dropped is what the app holds
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        metadata = synthetic_metadata(tracks, artists, albums_per_artist)
+        kept = build(metadata)
+        del metadata
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del kept
+        return size
+
+    def dict_layout(metadata):
+        songs = [{"path": p, **tags} for p, tags in metadata.items()]
+        by_artist = defaultdict(list)
+        by_artist_album = defaultdict(lambda: defaultdict(list))
+        for s in songs:
+            by_artist[s["album_artist"]].append(s)
+            by_artist_album[s["album_artist"]][s["album"]].append(s)
+        return metadata, songs, by_artist, by_artist_album
+
+    def table_layout(metadata):
+        table = TrackTable()
+        table.replace(metadata)
+        return table
+
+    dict_bytes = held(dict_layout)
+    table_bytes = held(table_layout)
+    mb = 1024 * 1024
+    return {
+        "memory_tracks": tracks,
+        "dict_layout_mb": round(dict_bytes / mb, 1),
+        "track_table_mb": round(table_bytes / mb, 1),
+        "bytes_per_track_dict": dict_bytes // max(1, tracks),
+        "bytes_per_track_table": table_bytes // max(1, tracks),
+    }
+
+
+def measure_search(tracks, artists, albums_per_artist, queries=("track 12", "artist 0001 album", "rock")):
+    """Index build time and the slowest keystroke while typing each query into the search box."""
+    from track_store import TrackTable
+
+    table = TrackTable()
+    table.replace(synthetic_metadata(tracks, artists, albums_per_artist))
+    build_s, _ = _timed(table.search, "x")
+    slowest = 0.0
+    for query in queries:
+        for end in range(1, len(query) + 1):
+            secs, _ = _timed(table.search, query[:end])
+            slowest = max(slowest, secs)
+    return {"search_index_build_s": build_s, "search_slowest_keystroke_ms": round(slowest * 1000, 2)}
+
+
+# ----------------------------------------------------------
+# CLI
+# ----------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark library scan and load paths.")
+    parser.add_argument("--tracks", type=int, default=2000)
+    parser.add_argument("--artists", type=int, default=100)
+    parser.add_argument("--albums-per-artist", type=int, default=2)
+    parser.add_argument("--art-size", type=int, default=500,
+                        help="embedded artwork edge in pixels (0 = no artwork)")
+    parser.add_argument("--flac-ratio", type=float, default=0.25,
+                        help="fraction of tracks written as FLAC instead of MP3")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--processes", action="store_true",
+                        help="use a process pool instead of threads")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default=None)
+    parser.add_argument("--work-dir", default=None,
+                        help="reuse this directory instead of a fresh temp dir")
+    parser.add_argument("--keep", action="store_true", help="don't delete the temp dir")
+    parser.add_argument("--output", default=None, help="also write the JSON results here")
+    parser.add_argument("--memory-tracks", type=int, default=100000,
+                        help="synthetic tracks for the in-memory store / search measurements (0 = skip)")
+    parser.add_argument("--memory-only", action="store_true",
+                        help="only measure the in-memory track store and search (no files generated)")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="music_bench_")
+    _isolate_environment(work_dir)
+
+    import config
+    if args.backend:
+        config.METADATA_BACKEND = args.backend
+        import metadata_store
+        metadata_store.METADATA_BACKEND = args.backend
+
+    music_dir = os.path.join(work_dir, "music")
+    try:
+        if args.memory_only:
+            results = measure_memory(args.memory_tracks, args.artists, args.albums_per_artist)
+            results.update(measure_search(args.memory_tracks, args.artists, args.albums_per_artist))
+        else:
+            secs, written = _timed(
+                generate_library, music_dir, args.tracks, args.artists,
+                args.albums_per_artist, args.art_size, args.flac_ratio,
+            )
+            results = {
+                "params": {k: v for k, v in vars(args).items() if k not in ("output", "work_dir")},
+                "backend": config.METADATA_BACKEND,
+                "generated_files": written,
+                "generate_s": secs,
+            }
+            results.update(run_benchmarks(music_dir, args.workers, args.processes))
+            if args.memory_tracks:
+                results.update(measure_memory(args.memory_tracks, args.artists, args.albums_per_artist))
+                results.update(measure_search(args.memory_tracks, args.artists, args.albums_per_artist))
+    finally:
+        if not args.keep and not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -21,21 +21,79 @@
 os.makedirs(ROAMING_DIR, exist_ok=True)
 os.makedirs(LOCAL_DIR, exist_ok=True)
 os.makedirs(os.path.join(LOCAL_DIR, "cache", "artwork"), exist_ok=True)
+os.makedirs(os.path.join(LOCAL_DIR, "cache", "artwork", "thumbs"), exist_ok=True)
+os.makedirs(os.path.join(LOCAL_DIR, "cache", "dir_index"), exist_ok=True)
+os.makedirs(os.path.join(LOCAL_DIR, "cache", "waveforms"), exist_ok=True)
 os.makedirs(os.path.join(ROAMING_DIR, "backups"), exist_ok=True)
 
 # === 4️⃣ Standard file locations ===
 PLAYLISTS_FILE = os.path.join(ROAMING_DIR, "playlists.json")
 METADATA_FILE  = os.path.join(ROAMING_DIR, "music_metadata.json")
+METADATA_DB    = os.path.join(ROAMING_DIR, "music_metadata.db")
 CACHE_FILE     = os.path.join(LOCAL_DIR, "library_cache.json")
 ARTWORK_DIR    = os.path.join(LOCAL_DIR, "cache", "artwork")
+THUMBNAIL_DIR  = os.path.join(ARTWORK_DIR, "thumbs")
+DIR_INDEX_DIR  = os.path.join(LOCAL_DIR, "cache", "dir_index")
+WAVEFORM_DIR   = os.path.join(LOCAL_DIR, "cache", "waveforms")
+SCAN_JOURNAL   = os.path.join(LOCAL_DIR, "cache", "scan_journal.jsonl")
 BACKUP_DIR     = os.path.join(ROAMING_DIR, "backups")
 
 # === 5️⃣ Default music directory ===
 DEFAULT_MUSIC_DIR = os.path.expandvars(r"%USERPROFILE%\Music")
 
+# Audio formats the library scanner and sync understand
+AUDIO_EXTS = {".mp3", ".ogg", ".wav", ".flac", ".m4a"}
+
 # === 6️⃣ Version tag ===
 APP_VERSION = "1.0.0"
 
+# === 7️⃣ Library scan tuning ===
+# Worker count for metadata extraction (1 = scan in the calling thread).
+SCAN_WORKERS = min(8, os.cpu_count() or 1)
+# Threads are cheapest for I/O-bound NAS scans; processes help when
+# artwork decoding dominates and the GIL becomes the bottleneck.
+SCAN_USE_PROCESSES = False
+# Top-level music folders walked concurrently during a scan.
+SCAN_WALK_WORKERS = 4
+# Skip re-listing folders whose mtime hasn't changed since the last scan.
+# Their known files are still stat'ed, so in-place retags are picked up.
+SCAN_PRUNE_UNCHANGED_DIRS = True
+# Parse MP3 tags from the ID3v2 header, first MPEG frame and ID3v1 tail
+# only (bounded reads); malformed or exotic tags fall back to mutagen.
+SCAN_FAST_MP3_READER = True
+# Checkpoint extracted entries to SCAN_JOURNAL every N files or T seconds
+# (whichever comes first); an interrupted scan resumes from the journal.
+SCAN_CHECKPOINT_FILES = 500
+SCAN_CHECKPOINT_SECONDS = 30
+
+# === 8️⃣ Metadata storage backend ===
+# "json"   -> music_metadata.json (default, rewritten in full on every scan)
+# "sqlite" -> music_metadata.db (row-level upserts; migrates the JSON once)
+METADATA_BACKEND = "json"
+
+# === 9️⃣ Live library watcher ===
+LIBRARY_WATCH_ENABLED = True
+LIBRARY_WATCH_DEBOUNCE_MS = 1500    # batch bursts of file events
+LIBRARY_POLL_INTERVAL_MS = 10000    # fallback when native watching is unavailable
+LIBRARY_WATCH_MAX_DIRS = 20000      # beyond this, poll instead of holding native watches
+LIBRARY_MODIFY_SWEEP_MS = 60000     # re-stat known files: folder events miss in-place edits
+
+# === 🔟 Loudness normalisation (ReplayGain-style) ===
+LOUDNESS_ANALYSIS_ENABLED = True
+# Decoding is CPU-bound: keep half the cores free for playback and the GUI.
+LOUDNESS_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+LOUDNESS_COMMIT_SECONDS = 30        # how often analysed tracks are saved (SQLite)
+LOUDNESS_JSON_COMMIT_SECONDS = 600  # the JSON store is rewritten whole, so much less often
+REPLAYGAIN_MODE = "album"           # "track", "album" or "off"
+REPLAYGAIN_REFERENCE_LUFS = -18.0   # ReplayGain 2.0 reference level
+REPLAYGAIN_PREAMP_DB = 0.0
+# Seek-bar waveform overviews are computed in the same decode pass.
+WAVEFORM_BINS = 1024
+
+# === 1️⃣1️⃣ Artwork thumbnails in the browser ===
+THUMBNAIL_CACHE_MB = 64             # decoded, scaled pixmaps kept in memory (LRU)
+THUMBNAIL_THREADS = 2               # background decoders
+
 
 # ----------------------------------------------------------
 # 🧪 Development Mode (only executed when running config.py directly)
@@ -54,5 +112,7 @@ def safe_print(x): print(x)
     safe_print(f"OneDrive dir : {ONEDRIVE_DATA_DIR}")
     safe_print(f"Playlists    : {PLAYLISTS_FILE}")
     safe_print(f"Metadata     : {METADATA_FILE}")
+    safe_print(f"Metadata DB  : {METADATA_DB} ({METADATA_BACKEND} backend)")
     safe_print(f"Artwork dir  : {ARTWORK_DIR}")
+    safe_print(f"Thumbnails   : {THUMBNAIL_DIR}")
     safe_print(f"Backups dir  : {BACKUP_DIR}")
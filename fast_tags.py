@@ -0,0 +1,365 @@
+# fast_tags.py — header-only MP3 tag reader for bulk scans
+#
+# Reads the ID3v2 tag, a small window after it (first MPEG frame and its
+# Xing/VBRI header) and the 128-byte ID3v1 tail — nothing else. Anything
+# this parser doesn't fully understand raises FastTagError so the caller
+# can fall back to mutagen.
+import io
+import struct
+
+from mutagen.id3 import TCON
+
+
+class FastTagError(Exception):
+    """The file needs a full mutagen parse."""
+
+
+# Tags bigger than this are almost certainly corrupt (or hold a huge
+# booklet scan); let mutagen deal with them.
+MAX_ID3V2_BYTES = 16 * 1024 * 1024
+# Window after the tag searched for the first MPEG frame
+MPEG_PROBE_BYTES = 4096
+
+TEXT_FRAMES = {
+    b"TIT2": "title",
+    b"TPE2": "albumartist",
+    b"TALB": "album",
+    b"TPUB": "organization",
+    b"TPOS": "discnumber",
+    b"TRCK": "tracknumber",
+    b"TDRC": "date",
+    b"TCON": "genre",
+    b"TCOM": "composer",
+    # ID3v2.3 date frames (mutagen upgrades these to TDRC)
+    b"TYER": "_year",
+    b"TDAT": "_daymonth",
+}
+
+TEXT_ENCODINGS = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}
+
+
+# ----------------------------------------------------------
+# Byte counting (scan stats)
+# ----------------------------------------------------------
+class CountingFile(io.FileIO):
+    """Raw file that counts the bytes actually read from disk."""
+
+    bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        if data:
+            self.bytes_read += len(data)
+        return data
+
+    def readall(self):
+        data = super().readall()
+        self.bytes_read += len(data)
+        return data
+
+    def readinto(self, buffer):
+        n = super().readinto(buffer)
+        if n:
+            self.bytes_read += n
+        return n
+
+
+def open_counted(path):
+    """(buffered file, raw CountingFile) for path."""
+    raw = CountingFile(path, "rb")
+    return io.BufferedReader(raw), raw
+
+
+# ----------------------------------------------------------
+# ID3v2
+# ----------------------------------------------------------
+def _synchsafe(data):
+    if any(b & 0x80 for b in data):
+        raise FastTagError("bad synchsafe integer")
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _valid_frame_id(fid):
+    return all(48 <= c <= 57 or 65 <= c <= 90 for c in fid)
+
+
+def _decode_text(payload):
+    """Text frame payload -> list of values."""
+    if not payload:
+        return []
+    encoding = TEXT_ENCODINGS.get(payload[0])
+    if encoding is None:
+        raise FastTagError("bad text encoding")
+    try:
+        text = payload[1:].decode(encoding)
+    except UnicodeDecodeError:
+        raise FastTagError("undecodable text frame")
+    return [v for v in text.rstrip("\x00").split("\x00") if v]
+
+
+def _split_terminated(data, encoding):
+    """Split a null-terminated string (1 or 2 byte terminator) off data."""
+    if encoding in (1, 2):
+        i = 0
+        while True:
+            i = data.find(b"\x00\x00", i)
+            if i < 0:
+                raise FastTagError("unterminated string")
+            if i % 2 == 0:
+                return data[i + 2:]
+            i += 1
+    i = data.find(b"\x00")
+    if i < 0:
+        raise FastTagError("unterminated string")
+    return data[i + 1:]
+
+
+def _apic_data(payload):
+    if len(payload) < 4 or payload[0] not in TEXT_ENCODINGS:
+        raise FastTagError("bad APIC frame")
+    rest = _split_terminated(payload[1:], 0)      # MIME type is always latin-1
+    if not rest:
+        raise FastTagError("bad APIC frame")
+    return _split_terminated(rest[1:], payload[0])  # skip picture type, description
+
+
+def _parse_id3v2(header, body):
+    """Return ({frame key: [values]}, first APIC bytes) from a tag body."""
+    major, flags = header[3], header[5]
+    if major not in (3, 4):
+        raise FastTagError(f"ID3v2.{major}")
+    if flags & 0xC0:
+        # whole-tag unsynchronisation or an extended header
+        raise FastTagError("unsupported tag flags")
+
+    frames, picture = {}, None
+    pos = 0
+    while pos + 10 <= len(body):
+        fid = body[pos:pos + 4]
+        if fid[0] == 0:
+            break  # padding
+        if not _valid_frame_id(fid):
+            raise FastTagError("bad frame id")
+        size_bytes = body[pos + 4:pos + 8]
+        size = _synchsafe(size_bytes) if major == 4 else struct.unpack(">I", size_bytes)[0]
+        format_flags = body[pos + 9]
+        # v2.4: grouping, compression, encryption, unsync, data length
+        # v2.3: compression, encryption, grouping
+        if format_flags & (0x4F if major == 4 else 0xE0):
+            raise FastTagError("unsupported frame flags")
+        start, pos = pos + 10, pos + 10 + size
+        if pos > len(body):
+            raise FastTagError("frame overruns tag")
+
+        payload = body[start:pos]
+        key = TEXT_FRAMES.get(fid)
+        if key and key not in frames:
+            frames[key] = _decode_text(payload)
+        elif fid == b"APIC" and picture is None:
+            picture = _apic_data(payload)
+    return frames, picture
+
+
+def _easy_tags(frames):
+    """Frame values -> EasyID3-style {key: first value}, like _id3_to_easy()."""
+    if "date" not in frames and frames.get("_year"):
+        date = frames["_year"][0]
+        daymonth = (frames.get("_daymonth") or [""])[0]
+        if len(daymonth) == 4:
+            date += f"-{daymonth[2:]}-{daymonth[:2]}"
+        frames["date"] = [date]
+
+    tags = {}
+    for key, values in frames.items():
+        if key.startswith("_") or not values:
+            continue
+        if key == "genre":
+            values = TCON(encoding=3, text=values).genres
+            if not values:
+                continue
+        tags[key] = values[0]
+    return tags
+
+
+# ----------------------------------------------------------
+# ID3v1 tail (fills in whatever the v2 tag lacks)
+# ----------------------------------------------------------
+def _parse_id3v1(tail):
+    if len(tail) != 128 or not tail.startswith(b"TAG"):
+        return {}
+
+    def fix(data):
+        return data.split(b"\x00")[0].strip().decode("latin-1")
+
+    tags = {}
+    for key, (a, b) in (("title", (3, 33)), ("album", (63, 93)), ("date", (93, 97))):
+        value = fix(tail[a:b])
+        if value:
+            tags[key] = value
+    track = tail[126]
+    # spaces instead of nulls in the comment mean there's no track number
+    if track and (track != 32 or tail[125] == 0):
+        tags["tracknumber"] = str(track)
+    if tail[127] != 255:
+        genres = TCON(encoding=0, text=str(tail[127])).genres
+        if genres:
+            tags["genre"] = genres[0]
+    return tags
+
+
+# ----------------------------------------------------------
+# First MPEG frame (stream properties)
+# ----------------------------------------------------------
+BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+VERSIONS = {0: 2.5, 2: 2, 3: 1}
+
+
+def _frame_header(data, i):
+    """Decode the 4-byte MPEG header at data[i], or None if it isn't one."""
+    if i + 4 > len(data) or data[i] != 0xFF or data[i + 1] & 0xE0 != 0xE0:
+        return None
+    b1, b2, b3 = data[i + 1], data[i + 2], data[i + 3]
+    version = VERSIONS.get((b1 >> 3) & 3)
+    layer = 4 - ((b1 >> 1) & 3)
+    bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+    if version is None or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    bitrate = BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    mode = b3 >> 6
+    if layer == 1:
+        frame_size = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        frame_size = 576 if version != 1 and layer == 3 else 1152
+        frame_length = frame_size // 8 * bitrate // sample_rate + padding
+    return {
+        "version": version, "layer": layer, "mode": mode,
+        "bitrate": bitrate, "sample_rate": sample_rate,
+        "frame_size": frame_size, "frame_length": frame_length,
+    }
+
+
+def _vbr_stream(data, i, frame):
+    """(duration, bitrate) from a Xing/Info or VBRI header, or None."""
+    if frame["layer"] != 3:
+        return None
+    mono = frame["mode"] == 3
+    if frame["version"] == 1:
+        xing_at = i + (21 if mono else 36)
+    else:
+        xing_at = i + (13 if mono else 21)
+    frame_size, sample_rate = frame["frame_size"], frame["sample_rate"]
+
+    if data[xing_at:xing_at + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing_at + 4:xing_at + 8])[0]
+        pos = xing_at + 8
+        frames = total_bytes = -1
+        if flags & 1:
+            frames = struct.unpack(">I", data[pos:pos + 4])[0]
+            pos += 4
+        if flags & 2:
+            total_bytes = struct.unpack(">I", data[pos:pos + 4])[0]
+            pos += 4
+        pos += (100 if flags & 4 else 0) + (4 if flags & 8 else 0)
+        if frames == -1:
+            return frame["bitrate"], None
+        samples = frame_size * frames
+        bitrate = frame["bitrate"]
+        if total_bytes != -1 and samples > 0:
+            audio_bytes = max(0, total_bytes - frame["frame_length"])
+            bitrate = round(audio_bytes * 8 * sample_rate / samples)
+        lame = data[pos:pos + 36]
+        if len(lame) == 36 and lame.startswith((b"LAME", b"L3.99")) and lame[9] >> 4 == 0:
+            samples -= (lame[21] << 4) | (lame[22] >> 4)
+            samples -= ((lame[22] & 0x0F) << 8) | lame[23]
+        return bitrate, max(0, samples) / sample_rate
+
+    vbri_at = i + 36
+    if data[vbri_at:vbri_at + 4] == b"VBRI" and len(data) >= vbri_at + 18:
+        total_bytes, frames = struct.unpack(">II", data[vbri_at + 10:vbri_at + 18])
+        length = frame_size * frames / sample_rate
+        bitrate = int(total_bytes * 8 / length) if length else frame["bitrate"]
+        return bitrate, length
+    return None
+
+
+def _mpeg_stream(data, audio_start, file_size):
+    """Stream properties from the first MPEG frame found in data."""
+    i = data.find(b"\xff")
+    while 0 <= i:
+        frame = _frame_header(data, i)
+        if frame:
+            # a second header right after it rules out a false sync
+            nxt = i + frame["frame_length"]
+            if nxt + 4 > len(data) or _frame_header(data, nxt):
+                break
+        i = data.find(b"\xff", i + 1)
+    else:
+        raise FastTagError("no MPEG frame in probe window")
+
+    bitrate, duration = frame["bitrate"], None
+    vbr = _vbr_stream(data, i, frame)
+    if vbr:
+        bitrate, duration = vbr
+    if duration is None:
+        # CBR: estimate from the size, like mutagen
+        duration = 8 * (file_size - (audio_start + i)) / frame["bitrate"]
+    return {
+        "duration": round(duration, 3),
+        "bitrate": int(bitrate),
+        "sample_rate": frame["sample_rate"],
+        "channels": 1 if frame["mode"] == 3 else 2,
+        "codec": "mp3",
+    }
+
+
+# ----------------------------------------------------------
+# Public entry point
+# ----------------------------------------------------------
+def read_mp3_fast(f, file_size=None):
+    """
+    Read tags, the first embedded picture and stream properties from an
+    open MP3 file with a handful of bounded reads. Returns
+    (tags, picture_bytes, stream) in the same shape as the mutagen
+    readers in tag_extractor; raises FastTagError when it can't.
+    """
+    if file_size is None:
+        file_size = f.seek(0, io.SEEK_END)
+    f.seek(0)
+
+    header = f.read(10)
+    frames, picture = {}, None
+    audio_start = 0
+    if len(header) == 10 and header.startswith(b"ID3"):
+        tag_size = _synchsafe(header[6:10])
+        if tag_size > MAX_ID3V2_BYTES or 10 + tag_size > file_size:
+            raise FastTagError("implausible tag size")
+        body = f.read(tag_size)
+        if len(body) != tag_size:
+            raise FastTagError("truncated tag")
+        frames, picture = _parse_id3v2(header, body)
+        audio_start = 10 + tag_size + (10 if header[5] & 0x10 else 0)
+
+    f.seek(audio_start)
+    probe = f.read(MPEG_PROBE_BYTES)
+    if probe.startswith(b"ID3"):
+        raise FastTagError("stacked ID3v2 tags")
+    stream = _mpeg_stream(probe, audio_start, file_size)
+
+    tags = _easy_tags(frames)
+    if file_size >= audio_start + 128:
+        f.seek(file_size - 128)
+        for key, value in _parse_id3v1(f.read(128)).items():
+            tags.setdefault(key, value)
+    return tags, picture, stream
@@ -0,0 +1,173 @@
+# library_index.py — persisted browse index (library_cache.json) for instant startup
+import os
+import json
+import locale
+import threading
+from collections import namedtuple
+
+from config import CACHE_FILE
+from metadata_store import METADATA_SCHEMA_VERSION
+from safe_print import safe_print
+
+
+BROWSE_INDEX_VERSION = 2
+
+_SAVE_LOCK = threading.Lock()
+
+# File layout, one JSON document per line so startup can stop early:
+#   1: {"version", "schema", "collation", "signature", "artists", "albums", "tracks"}
+#   2: [[artist, [[album, artwork], ...]], ...]          browse order
+#   3: [[[path, title, track_number], ...], ...]         one list per album, line-2 order
+# The order is TrackTable's (collation keys, disc/track numbers), so the
+# index is also tied to the LC_COLLATE locale it was sorted under.
+# Lines 1-2 scale with artists/albums and are all the first paint needs;
+# line 3 is only parsed if someone opens an album before the full track
+# table has finished loading.
+
+
+class CachedSong(namedtuple("CachedSong", ("path", "title", "track_number", "album_id"))):
+    """What the browser shows for a song until the full track table is loaded."""
+
+    __slots__ = ()
+
+
+class BrowseSnapshot:
+    """
+    Read-only stand-in for TrackTable's browse API (sorted_artists,
+    sorted_albums, album_id, album_tracks, album_art, artist_art), backed
+    by the persisted index.
+    """
+
+    def __init__(self, path, artists, tracks_offset):
+        self.path = path
+        self._tracks_offset = tracks_offset
+        self._album_songs = None
+        self._artists = {}        # artist -> {album: id}, in browse order
+        self._album_art = []      # id -> artwork
+        for artist, albums in artists:
+            ids = self._artists[artist] = {}
+            for album, art in albums:
+                ids[album] = len(self._album_art)
+                self._album_art.append(art)
+
+    def __len__(self):
+        return len(self._album_art)
+
+    def sorted_artists(self):
+        return list(self._artists)
+
+    def sorted_albums(self, artist):
+        return list(self._artists.get(artist, {}))
+
+    def albums(self, artist):
+        return self._artists.get(artist, {})
+
+    def album_id(self, artist, album):
+        return self._artists.get(artist, {}).get(album)
+
+    def album_art(self, album_id):
+        if album_id is None or not 0 <= album_id < len(self._album_art):
+            return ""
+        return self._album_art[album_id]
+
+    def artist_art(self, artist):
+        albums = self._artists.get(artist)
+        return self._album_art[next(iter(albums.values()))] if albums else ""
+
+    def album_tracks(self, album_id):
+        if album_id is None:
+            return []
+        if self._album_songs is None:
+            self._album_songs = self._read_songs()
+        if not 0 <= album_id < len(self._album_songs):
+            return []
+        return [CachedSong(path, title, number, album_id) for path, title, number in self._album_songs[album_id]]
+
+    def _read_songs(self):
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._tracks_offset)
+                return json.loads(f.readline())
+        except Exception:
+            return []
+
+
+def _signature_matches(header, signature):
+    return (
+        isinstance(header, dict)
+        and header.get("version") == BROWSE_INDEX_VERSION
+        and header.get("schema") == METADATA_SCHEMA_VERSION
+        and header.get("collation") == locale.setlocale(locale.LC_COLLATE)
+        and signature is not None
+        and header.get("signature") == list(signature)
+    )
+
+
+def load_browse_index(signature, path=CACHE_FILE):
+    """BrowseSnapshot if path was written for this metadata signature, else None."""
+    try:
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            if not _signature_matches(header, signature):
+                return None
+            artists = json.loads(f.readline())
+            tracks_offset = f.tell()
+    except Exception:
+        return None
+    return BrowseSnapshot(path, artists, tracks_offset)
+
+
+def snapshot_browse_index(tracks):
+    """
+    The browse order of tracks (a TrackTable), detached from it: Track tuples
+    are immutable, so the result can be written from another thread while
+    the table keeps changing.
+    """
+    artists = []
+    for artist in tracks.sorted_artists():
+        albums = []
+        for album in tracks.sorted_albums(artist):
+            album_id = tracks.album_id(artist, album)
+            albums.append((album, tracks.album_art(album_id), tuple(tracks.album_tracks(album_id))))
+        artists.append((artist, albums))
+    return artists, len(tracks)
+
+
+def save_browse_index(tracks, signature, path=CACHE_FILE):
+    """Write tracks' browse order (a TrackTable) tagged with the metadata signature."""
+    return write_browse_index(snapshot_browse_index(tracks), signature, path)
+
+
+def write_browse_index(snapshot, signature, path=CACHE_FILE):
+    """Write a snapshot_browse_index() result; safe to call off the GUI thread."""
+    if signature is None:
+        return False
+    browse, track_count = snapshot
+    artists, songs = [], []
+    for artist, albums in browse:
+        artists.append([artist, [[album, artwork] for album, artwork, _ in albums]])
+        for _, _, album_tracks in albums:
+            songs.append([[t.path, t.title or "", t.track_number or ""] for t in album_tracks])
+
+    header = {
+        "version": BROWSE_INDEX_VERSION,
+        "schema": METADATA_SCHEMA_VERSION,
+        "collation": locale.setlocale(locale.LC_COLLATE),
+        "signature": list(signature),
+        "artists": len(artists),
+        "albums": len(songs),
+        "tracks": track_count,
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # the load worker and the delta saver may both write
+    with _SAVE_LOCK:
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for doc in (header, artists, songs):
+                    f.write(json.dumps(doc, ensure_ascii=False, separators=(",", ":")))
+                    f.write("\n")
+            os.replace(tmp_path, path)
+        except Exception as e:
+            safe_print(f"Could not write browse index: {e}")
+            return False
+    return True
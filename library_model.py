@@ -0,0 +1,149 @@
+# library_model.py — lazy list model behind the Library tab's QListView
+import os
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSize
+from PyQt5.QtGui import QPixmap, QPainter, QColor
+
+from thumbnail_service import shared_thumbnail_service
+from track_store import UNKNOWN_ARTIST, UNKNOWN_ALBUM
+
+
+def make_placeholder_pixmap(size: QSize) -> QPixmap:
+    w, h = size.width(), size.height()
+    pm = QPixmap(w, h)
+    pm.fill(QColor(0, 0, 0))
+    p = QPainter(pm)
+    p.setPen(QColor(0, 255, 102))  # Matrix Green Border
+    p.drawRect(0, 0, w - 1, h - 1)
+    p.end()
+    return pm
+
+
+class LibraryListModel(QAbstractListModel):
+    """
+    One level of the Library browser (or a page of search results) over a
+    browse source: the TrackTable, or at startup the persisted
+    BrowseSnapshot until the table has loaded.
+
+    A level is just a list of keys (facet values such as genres or
+    decades, artist names, album names, album ids or Track records); labels, payloads and icons are produced in data(), which the
+    view only calls for rows it paints. Artwork comes from the shared
+    ThumbnailService: rows show a placeholder until their thumbnail is
+    decoded, then get a dataChanged for the decoration only.
+    """
+
+    def __init__(self, source, icon_size: QSize, parent=None, thumbnails=None):
+        super().__init__(parent)
+        self.source = source
+        self.icon_size = icon_size
+        self.placeholder = make_placeholder_pixmap(icon_size)
+        self.thumbnails = thumbnails or shared_thumbnail_service()
+        self.thumbnails.thumbnail_ready.connect(self._on_thumbnail_ready)
+        self.kind = "artists"
+        self.facet = None
+        self.artist = None
+        self.album = None
+        self._rows = []
+        self._waiting = {}            # art path -> rows showing the placeholder
+
+    # ---------- levels ----------
+    def _reset(self, kind, rows, artist=None, album=None, facet=None):
+        self.beginResetModel()
+        self.kind, self.artist, self.album, self.facet = kind, artist, album, facet
+        self._rows = rows
+        self._waiting.clear()
+        self.endResetModel()
+
+    def show_groups(self, facet, values):
+        """Facet values (genres, decades, years, composers) as rows."""
+        self._reset("groups", list(values), facet=facet)
+
+    def show_artists(self, artists=None):
+        self._reset("artists", self.source.sorted_artists() if artists is None else list(artists))
+
+    def show_albums(self, artist, albums=None):
+        self._reset("albums", self.source.sorted_albums(artist) if albums is None else list(albums), artist)
+
+    def show_album_ids(self, album_ids):
+        """Albums from different artists (e.g. a year, a composer's works)."""
+        self._reset("album_ids", list(album_ids))
+
+    def show_songs(self, artist, album, tracks=None):
+        if tracks is None:
+            tracks = self.source.album_tracks(self.source.album_id(artist, album))
+        self._reset("songs", list(tracks), artist, album)
+
+    def show_results(self, tracks):
+        self._reset("results", list(tracks))
+
+    # ---------- rows ----------
+    def payload(self, row):
+        """{"type": ..., "artist", "album", "song"} for row, like the old item data."""
+        key = self._rows[row]
+        if self.kind == "groups":
+            return {"type": "group", "facet": self.facet, "value": key}
+        if self.kind == "artists":
+            return {"type": "artist", "artist": key}
+        if self.kind == "albums":
+            return {"type": "album", "artist": self.artist, "album": key}
+        if self.kind == "album_ids":
+            artist, album = self.source.album_key(key)
+            return {"type": "album", "artist": artist, "album": album}
+        if self.kind == "results":
+            artist, album = key.album_artist or UNKNOWN_ARTIST, key.album or UNKNOWN_ALBUM
+            return {"type": "song", "artist": artist, "album": album, "song": key}
+        return {"type": "song", "artist": self.artist, "album": self.album, "song": key}
+
+    def _label(self, key):
+        if self.kind in ("groups", "artists", "albums"):
+            return key
+        if self.kind == "album_ids":
+            artist, album = self.source.album_key(key)
+            return f"{album} — {artist}"
+        # entries are normalised at load (metadata_store), so plain attributes
+        title = key.title or os.path.basename(key.path)
+        if self.kind == "results":
+            return f"{title} — {key.album_artist or UNKNOWN_ARTIST} · {key.album or UNKNOWN_ALBUM}"
+        return f"{key.track_number}. {title}" if key.track_number else title
+
+    def _art_path(self, key):
+        if self.kind == "groups":
+            return self.source.facet_art(self.facet, key)
+        if self.kind == "album_ids":
+            return self.source.album_art(key)
+        if self.kind == "artists":
+            return self.source.artist_art(key)
+        if self.kind == "albums":
+            return self.source.album_art(self.source.album_id(self.artist, key))
+        return self.source.album_art(key.album_id)
+
+    def _decoration(self, row, key):
+        art_path = self._art_path(key)
+        pixmap = self.thumbnails.pixmap(art_path, self.icon_size)
+        if pixmap is not None:
+            return pixmap
+        if art_path:
+            self._waiting.setdefault(art_path, set()).add(row)
+        return self.placeholder
+
+    def _on_thumbnail_ready(self, art_path):
+        for row in self._waiting.pop(art_path, ()):
+            if row < len(self._rows):
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    # ---------- QAbstractListModel ----------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        key = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return self._label(key)
+        if role == Qt.DecorationRole:
+            return self._decoration(index.row(), key)
+        if role == Qt.ToolTipRole and self.kind in ("songs", "results"):
+            return key.path
+        return None
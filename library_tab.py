@@ -2,71 +2,65 @@
 import os
 import sys
 import json
-from collections import defaultdict
+import threading
 
-from PyQt5.QtCore import Qt, QSize
-from PyQt5.QtGui import QIcon, QPixmap, QPainter, QColor
+from PyQt5.QtCore import Qt, QSize, QTimer, pyqtSignal
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QListWidget,
-    QListWidgetItem, QLabel, QMessageBox, QSpacerItem, QSizePolicy
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QListView, QComboBox,
+    QLabel, QLineEdit, QMessageBox, QSpacerItem, QSizePolicy
 )
-from config import ROAMING_DIR, LOCAL_DIR
+from config import ROAMING_DIR, LOCAL_DIR, METADATA_FILE
+from metadata_store import open_metadata_store, JSONMetadataStore
+from library_model import LibraryListModel
+from library_index import load_browse_index, save_browse_index, snapshot_browse_index, write_browse_index
+from load_worker import LibraryLoadWorker
+from scan_worker import ScanWorker
+from track_store import TrackTable, BROWSE_FACETS
 
 from safe_print import safe_print
 
-AUDIO_EXTS = {".mp3", ".ogg", ".wav", ".flac", ".m4a"}
-
-
-# --------- small utilities ---------
-def _safe_get(d, *names, default=""):
-    for n in names:
-        if n in d:
-            return d[n]
-    lowered = {k.lower(): v for k, v in d.items()}
-    for n in names:
-        v = lowered.get(n.lower())
-        if v is not None:
-            return v
-    return default
-
-
-def _make_placeholder_icon(size: QSize) -> QIcon:
-    w, h = size.width(), size.height()
-    pm = QPixmap(w, h)
-    pm.fill(QColor(0, 0, 0))
-    p = QPainter(pm)
-    p.setPen(QColor(0, 255, 102))  # Matrix Green Border
-    p.drawRect(0, 0, w - 1, h - 1)
-    p.end()
-    return QIcon(pm)
-
-
-def _icon_from_art(path, size: QSize) -> QIcon:
-    """Load album art safely from permanent cache."""
-    if path:
-        full_path = path if os.path.isabs(path) else os.path.join(LOCAL_DIR, path)
-        if os.path.exists(full_path):
-            pm = QPixmap(full_path)
-            if not pm.isNull():
-                return QIcon(pm.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-    return _make_placeholder_icon(size)
 
+# Browse modes: (name, combo label, levels a double-click walks down as
+# (kind, header title)). Facet levels list that facet's values; the songs
+# of an album are filtered by the deepest facet picked on the way down.
+BROWSE_MODES = (
+    ("artist", "Artist → Album", (("artists", "Artists"), ("albums", "Albums"), ("songs", None))),
+    ("genre", "Genre → Artist → Album", (("genre", "Genres"), ("artists", "Artists"), ("albums", "Albums"), ("songs", None))),
+    ("year", "Decade → Year → Album", (("decade", "Decades"), ("year", "Years"), ("album_ids", "Albums"), ("songs", None))),
+    ("composer", "Composer → Work", (("composer", "Composers"), ("album_ids", "Works"), ("songs", None))),
+)
 
 class LibraryTab(QWidget):
     """
-    Three-level browser:
-      Level 'artists' -> list of artists
-      Level 'albums'  -> albums for artist
-      Level 'songs'   -> tracks for album
+    Library browser. The browse mode (BROWSE_MODES) picks the levels:
+      Artist → Album → songs (default), Genre → Artist → Album → songs,
+      Decade → Year → Album → songs, Composer → Work → songs.
+    self.nav holds the rows double-clicked on the way down; level
+    'search' shows ranked matches for the search box instead.
     Double-click on song adds it to Player queue + Playlist builder.
+    Emits paths_moved({old: new}) when a rescan recognises moved files,
+    scan_completed(result) after every rescan, library_loaded() when
+    a background load (at startup or after a rescan) is over and
+    tracks_updated(delta) once a metadata delta is in the shared table.
+
+    With load_async=True the track table is loaded on a worker thread and,
+    meanwhile, the browser is painted from the persisted browse index
+    (library_cache.json) if it still matches the metadata on disk.
     """
 
+    paths_moved = pyqtSignal(dict)
+    scan_completed = pyqtSignal(dict)
+    library_loaded = pyqtSignal()
+    tracks_updated = pyqtSignal(dict)
+
     def __init__(
         self,
         root_folder,
         add_to_player_queue_callback,
         add_to_playlist_queue_callback,
-        metadata_path=None
+        metadata_path=None,
+        tracks=None,
+        load_async=False
     ):
         super().__init__()
 
@@ -92,15 +86,24 @@ def __init__(
             safe_print(f"Created new metadata file at {self.metadata_path}")  # ✅
 
         # navigation state
+        self.browse_mode = BROWSE_MODES[0][0]
         self.level = "artists"
-        self.current_artist = None
-        self.current_album = None
+        self.nav = []                 # payloads of the rows opened to get here
 
         self.thumb_size = QSize(80, 60)
-        self.songs = []
-        self.by_artist = defaultdict(list)
-        self.by_artist_album = defaultdict(lambda: defaultdict(list))
-        self.album_art = {}
+        # shared with PlayerTab when MainWindow passes one in
+        self.tracks = tracks if tracks is not None else TrackTable()
+        self.scan_worker = None
+        self.scan_header = ""
+        self.load_worker = None
+        self.load_again = False       # the store changed under load_worker; drop its table, load again
+        self.pending_deltas = []      # watcher deltas that arrive while load_worker runs
+
+        # the browse index is rewritten shortly after the last delta, not per delta
+        self.index_save_timer = QTimer(self)
+        self.index_save_timer.setSingleShot(True)
+        self.index_save_timer.setInterval(2000)
+        self.index_save_timer.timeout.connect(self.save_browse_index)
 
         # ---------- UI ----------
         root = QVBoxLayout(self)
@@ -115,6 +118,13 @@ def __init__(
         self.back_btn.setEnabled(False)
         header_row.addWidget(self.back_btn, 0, Qt.AlignLeft)
 
+        self.mode_box = QComboBox()
+        self.mode_box.setFixedHeight(32)
+        for _, label, _ in BROWSE_MODES:
+            self.mode_box.addItem(label)
+        self.mode_box.currentIndexChanged.connect(self.on_mode_changed)
+        header_row.addWidget(self.mode_box, 0, Qt.AlignLeft)
+
         header_row.addSpacerItem(QSpacerItem(10, 10, QSizePolicy.Expanding, QSizePolicy.Minimum))
 
         self.header_label = QLabel("Library — Artists")
@@ -130,161 +140,351 @@ def __init__(
 
         root.addLayout(header_row)
 
-        self.list = QListWidget()
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search titles, artists, albums, composers, genres, labels…")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.textChanged.connect(self.on_search_changed)
+        root.addWidget(self.search_box)
+
+        # rows (and their icons) are only built when the view paints them
+        self.model = LibraryListModel(self.tracks, self.thumb_size, self)
+        self.list = QListView()
+        self.list.setModel(self.model)
         self.list.setIconSize(self.thumb_size)
-        self.list.itemDoubleClicked.connect(self.on_item_double_clicked)
+        self.list.setUniformItemSizes(True)
+        self.list.setEditTriggers(QListView.NoEditTriggers)
+        self.list.doubleClicked.connect(self.on_item_double_clicked)
         root.addWidget(self.list)
 
-        self.reload_metadata()
+        if load_async:
+            self.load_library_async()
+        else:
+            self.reload_metadata()
 
     # ---------- Data loading ----------
-    def reload_metadata(self):
-        try:
-            with open(self.metadata_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            if isinstance(data, dict):
-                songs = [{"path": p, **tags} for p, tags in data.items()]
-            elif isinstance(data, list):
-                songs = data
-            elif isinstance(data, dict) and "songs" in data:
-                songs = data["songs"]
-            else:
-                songs = []
+    def _open_store(self):
+        # an explicit metadata_path always means a JSON file
+        if os.path.normpath(self.metadata_path) == os.path.normpath(METADATA_FILE):
+            return open_metadata_store()
+        return JSONMetadataStore(self.metadata_path)
 
-            self.songs = songs
-            self.by_artist.clear()
-            self.by_artist_album.clear()
-            self.album_art.clear()
+    def _show_top_level(self):
+        self.search_box.blockSignals(True)
+        self.search_box.clear()
+        self.search_box.blockSignals(False)
 
-            for s in self.songs:
-                artist = _safe_get(s, "album_artist", "artist", "Album Artist") or "Unknown Artist"
-                album = _safe_get(s, "album", "Album") or "Unknown Album"
-                art = _safe_get(s, "artwork", "artwork_path", "art_path", "ArtworkPath")
+        self.nav = []
+        self.show_level()
 
-                self.by_artist[artist].append(s)
-                self.by_artist_album[artist][album].append(s)
-                key = (artist, album)
-                if key not in self.album_art:
-                    self.album_art[key] = art
-
-            self.level = "artists"
-            self.back_btn.setEnabled(False)
-            self.header_label.setText("Library — Artists")
-            self.populate_artists()
-
-            safe_print(f"Library loaded {len(self.songs)} songs from metadata.")  # ✅
+    def reload_metadata(self):
+        try:
+            store = self._open_store()
+            try:
+                signature = store.signature()
+                self.tracks.reload(store)
+            finally:
+                store.close()
+            self.tracks.build_search_index()
+
+            self.model.source = self.tracks
+            self._show_top_level()
+            safe_print(f"Library loaded {len(self.tracks)} songs from metadata.")  # ✅
+            save_browse_index(self.tracks, signature)
 
         except Exception as e:
             QMessageBox.critical(self, "Metadata Error", f"Failed to read metadata:\n{e}")
 
+    def load_library_async(self):
+        """
+        Startup load: paint artists from the persisted browse index when it
+        matches the metadata signature, and load the full track table on a
+        worker thread. Search and song playback details wait for the table.
+        """
+        try:
+            store = self._open_store()
+            try:
+                signature = store.signature()
+            finally:
+                store.close()
+        except Exception:
+            signature = None
+
+        snapshot = load_browse_index(signature)
+        if snapshot is not None:
+            self.model.source = snapshot
+            self._show_top_level()
+            safe_print(f"Library index loaded ({len(snapshot)} albums); loading tracks…")
+        else:
+            self.header_label.setText("Loading library…")
+        # the snapshot only covers Artist → Album; search and other modes need the table
+        self.search_box.setEnabled(False)
+        self.mode_box.setEnabled(False)
+        self.start_load_worker()
+
+    def start_load_worker(self):
+        """
+        Load the full track table on a LibraryLoadWorker; on_library_loaded
+        swaps it in. The current table stays on screen meanwhile, and
+        watcher deltas are queued for replay.
+        """
+        if self.load_worker is not None:
+            # its store read may predate the latest commit
+            self.load_again = True
+            return
+        self.load_again = False
+        self.load_worker = LibraryLoadWorker(self._open_store, self)
+        self.load_worker.loaded.connect(self.on_library_loaded)
+        self.load_worker.failed.connect(self.on_library_load_failed)
+        self.load_worker.finished.connect(self._on_load_thread_done)
+        self.load_worker.start()
+
+    def on_library_loaded(self, table, signature):
+        if self.load_again:
+            return
+        # PlayerTab holds the same TrackTable object, so fill it rather than replace it
+        self.tracks.adopt(table)
+        deltas, self.pending_deltas = self.pending_deltas, []
+        for delta in deltas:
+            self.tracks.apply_delta(delta)
+            self.tracks_updated.emit(delta)
+        self.model.source = self.tracks
+        self.search_box.setEnabled(True)
+        self.mode_box.setEnabled(True)
+        self.refresh_current_level()
+        safe_print(f"Library loaded {len(self.tracks)} songs from metadata.")  # ✅
+
+        # the worker saved the index for the table as loaded
+        if deltas:
+            self.index_save_timer.start()
+
+    def on_library_load_failed(self, message):
+        if self.load_again:
+            return
+        self.search_box.setEnabled(True)
+        self.mode_box.setEnabled(True)
+        self.pending_deltas = []
+        QMessageBox.critical(self, "Metadata Error", f"Failed to read metadata:\n{message}")
+
+    def _on_load_thread_done(self):
+        self.load_worker.deleteLater()
+        self.load_worker = None
+        if self.load_again:
+            self.start_load_worker()
+            return
+        self.library_loaded.emit()
+
+    def save_browse_index(self):
+        """Persist the browse index for the metadata as it is on disk now."""
+        if self.load_worker is not None:
+            return
+        # only the snapshot is taken here; serializing 100k tracks is left to a thread
+        snapshot = snapshot_browse_index(self.tracks)
+        threading.Thread(target=self._save_browse_index_thread, args=(snapshot,), daemon=True).start()
+
+    def _save_browse_index_thread(self, snapshot):
+        try:
+            store = self._open_store()
+            try:
+                signature = store.signature()
+            finally:
+                store.close()
+        except Exception:
+            return
+        write_browse_index(snapshot, signature)
+
+    def apply_metadata_delta(self, delta):
+        """
+        Apply a LibraryWatcher delta in place and refresh only the list
+        that is currently on screen (no full metadata reload).
+        """
+        if not delta.get("upserts") and not delta.get("removed"):
+            return
+        if self.load_worker is not None:
+            # replayed onto the table once the load lands
+            self.pending_deltas.append(delta)
+            return
+        self.tracks.apply_delta(delta)
+        self.tracks_updated.emit(delta)
+        self.index_save_timer.start()
+        self.refresh_current_level()
+
+    def refresh_current_level(self):
+        """Re-populate the level on screen, stepping back if what it showed is gone."""
+        if self.level == "search":
+            self.on_search_changed(self.search_box.text())
+        else:
+            self.show_level()
+
     # ---------- List population ----------
+    def _mode_levels(self):
+        return next(levels for name, _, levels in BROWSE_MODES if name == self.browse_mode)
+
+    def _populate(self, kind):
+        """Fill the model with level kind under self.nav; returns the row count."""
+        groups = [(p["facet"], p["value"]) for p in self.nav if p["type"] == "group"]
+        facet, value = groups[-1] if groups else (None, None)
+        opened = self.nav[-1] if self.nav else {}
+
+        if kind in BROWSE_FACETS:
+            values = self.tracks.facet_values(kind)
+            if facet == "decade":
+                values = [v for v in values if f"{v[:3]}0s" == value]
+            self.model.show_groups(kind, values)
+        elif kind == "artists":
+            if facet:
+                self.model.show_artists(self.tracks.facet_artists(facet, value))
+            else:
+                self.populate_artists()
+        elif kind == "albums":
+            artist = opened["artist"]
+            self.model.show_albums(artist, self.tracks.facet_albums(facet, value, artist) if facet else None)
+        elif kind == "album_ids":
+            self.model.show_album_ids(self.tracks.facet_album_ids(facet, value))
+        else:
+            artist, album = opened["artist"], opened["album"]
+            tracks = None
+            if facet:
+                tracks = self.tracks.facet_tracks(facet, value, self.tracks.album_id(artist, album))
+            self.model.show_songs(artist, album, tracks)
+        return self.model.rowCount()
+
+    def _header(self, kind, title):
+        if not self.nav:
+            return f"Library — {title}"
+        if kind == "songs":
+            return f"{self.nav[-1]['artist']} — {self.nav[-1]['album']}"
+        labels = [p.get("value") or p.get("album") or p.get("artist") for p in self.nav]
+        return f"{' · '.join(labels)} — {title}"
+
+    def show_level(self):
+        """Show the level self.nav leads to in the current browse mode."""
+        levels = self._mode_levels()
+        while True:
+            kind, title = levels[len(self.nav)]
+            # an emptied level (e.g. its album was deleted) steps back up
+            if self._populate(kind) or not self.nav:
+                break
+            self.nav.pop()
+        self.level = kind
+        self.back_btn.setEnabled(bool(self.nav))
+        self.header_label.setText(self._header(kind, title))
+
     def populate_artists(self):
-        self.list.clear()
-        for artist in sorted(self.by_artist.keys(), key=str.lower):
-            albums = self.by_artist_album[artist]
-            art_path = None
-            if albums:
-                first_album = sorted(albums.keys(), key=str.lower)[0]
-                art_path = self.album_art.get((artist, first_album))
-            icon = _icon_from_art(art_path, self.thumb_size)
-            item = QListWidgetItem(icon, artist)
-            item.setData(Qt.UserRole, {"type": "artist", "artist": artist})
-            self.list.addItem(item)
-
-    def populate_albums(self, artist):
-        self.list.clear()
-        albums = self.by_artist_album.get(artist, {})
-        for album in sorted(albums.keys(), key=str.lower):
-            art_path = self.album_art.get((artist, album))
-            icon = _icon_from_art(art_path, self.thumb_size)
-            item = QListWidgetItem(icon, album)
-            item.setData(Qt.UserRole, {"type": "album", "artist": artist, "album": album})
-            self.list.addItem(item)
-
-    def populate_songs(self, artist, album):
-        self.list.clear()
-        songs = self.by_artist_album.get(artist, {}).get(album, [])
-        art_path = self.album_art.get((artist, album))
-        icon = _icon_from_art(art_path, self.thumb_size)
-        for s in songs:
-            path = _safe_get(s, "path", "file_path", "Path")
-            title = _safe_get(s, "title", "Title") or os.path.basename(path)
-            track = _safe_get(s, "track_number", "track", "TrackNumber", "Track #")
-            track_str = str(track[0]) if isinstance(track, (list, tuple)) and track else str(track or "")
-            label = f"{track_str}. {title}" if track_str else title
-            item = QListWidgetItem(icon, label)
-            item.setData(Qt.UserRole, {"type": "song", "artist": artist, "album": album, "song": s})
-            self.list.addItem(item)
+        self.model.show_artists()
+
+    # ---------- Search ----------
+    def on_search_changed(self, text):
+        query = text.strip()
+        if not query:
+            if self.level == "search":
+                self.show_level()
+            return
+        # the index was built with the table, and is kept current by it
+        results = self.tracks.search(query)
+        self.level = "search"
+        self.back_btn.setEnabled(True)
+        self.header_label.setText(f"Search — {len(results)} match{'es' if len(results) != 1 else ''}")
+        self.model.show_results(results)
 
     # ---------- Navigation ----------
+    def on_mode_changed(self, index):
+        self.browse_mode = BROWSE_MODES[index][0]
+        self._show_top_level()
+
     def on_back_clicked(self):
-        if self.level == "songs":
-            self.level = "albums"
-            self.header_label.setText(f"{self.current_artist} — Albums")
-            self.populate_albums(self.current_artist)
-            self.current_album = None
-
-        elif self.level == "albums":
-            self.level = "artists"
-            self.header_label.setText("Library — Artists")
-            self.populate_artists()
-            self.back_btn.setEnabled(False)
-
-    def on_item_double_clicked(self, item):
-        payload = item.data(Qt.UserRole) or {}
+        if self.level == "search":
+            self.search_box.clear()
+        elif self.nav:
+            self.nav.pop()
+            self.show_level()
+
+    def on_item_double_clicked(self, index):
+        if not index.isValid():
+            return
+        payload = self.model.payload(index.row())
         typ = payload.get("type")
 
-        if typ == "artist":
-            self.current_artist = payload["artist"]
-            self.level = "albums"
-            self.header_label.setText(f"{self.current_artist} — Albums")
-            self.populate_albums(self.current_artist)
-            self.back_btn.setEnabled(True)
-
-        elif typ == "album":
-            self.current_artist = payload["artist"]
-            self.current_album = payload["album"]
-            self.level = "songs"
-            self.header_label.setText(f"{self.current_artist} — {self.current_album}")
-            self.populate_songs(self.current_artist, self.current_album)
-            self.back_btn.setEnabled(True)
+        if typ in ("group", "artist", "album"):
+            self.nav.append(payload)
+            self.show_level()
 
         elif typ == "song":
-            song = payload.get("song", {})
-            path = _safe_get(song, "path", "file_path", "Path")
+            song = payload.get("song")
+            path = song.path if song is not None else ""
             if not path or not os.path.exists(path):
                 QMessageBox.warning(self, "Error", f"File not found:\n{path}")
                 return
             self.add_to_player_queue(path)
             self.add_to_playlist_queue(path)
 
-    # ---------- Rescan ----------
+    # ---------- Rescan (background worker) ----------
     def rescan_and_reload(self):
-        try:
-            # Import rebuild function from bundled module
-            from tag_extractor import rebuild_music_metadata
-
-            # Perform metadata rebuild
-            result = rebuild_music_metadata()
-
-            safe_print(
-                f"Metadata rebuilt! Total={result['total']}, "
-                f"New={result['new']}, Removed={result['removed']}"
+        # second click while scanning = cancel
+        if self.scan_worker is not None:
+            self.scan_worker.cancel()
+            self.reload_btn.setEnabled(False)
+            self.reload_btn.setText("Cancelling...")
+            return
+
+        self.scan_header = self.header_label.text()
+        self.reload_btn.setText("Cancel Scan")
+
+        self.scan_worker = ScanWorker(self)
+        self.scan_worker.progress.connect(self.on_scan_progress)
+        self.scan_worker.finished_scan.connect(self.on_scan_finished)
+        self.scan_worker.failed.connect(self.on_scan_failed)
+        self.scan_worker.finished.connect(self._on_scan_thread_done)
+        self.scan_worker.start()
+
+    def on_scan_progress(self, stats):
+        self.header_label.setText(
+            f"Scanning… {stats['seen']} seen, "
+            f"{stats['extracted']}/{stats['pending']} extracted, "
+            f"{stats['removed']} removed"
+        )
+        self.header_label.setToolTip(stats.get("current", ""))
+
+    def on_scan_finished(self, result):
+        safe_print(
+            f"Metadata rebuilt! Total={result['total']}, "
+            f"New={result['new']}, Updated={result.get('updated', 0)}, "
+            f"Moved={result.get('moved', 0)}, Removed={result['removed']}, "
+            f"Resumed={result.get('resumed', 0)}, "
+            f"Read={result.get('bytes_per_file', 0) / 1024:.1f} KB/file"
+        )
+        if result.get("moves"):
+            self.paths_moved.emit(result["moves"])
+        self.scan_completed.emit(result)
+
+        # Reload library from metadata file, off the GUI thread
+        self.header_label.setText(self.scan_header)
+        self.header_label.setToolTip("")
+        self.start_load_worker()
+
+        if result.get("cancelled"):
+            QMessageBox.information(
+                self,
+                "Scan Cancelled",
+                "Scan cancelled — files processed so far were saved."
             )
-
-            # Reload library from metadata file
-            self.reload_metadata()
-
+        else:
             QMessageBox.information(
                 self,
                 "Reload Complete",
                 "Library successfully rescanned and reloaded!"
             )
 
-        except Exception as e:
-            QMessageBox.critical(
-                self,
-                "Reload Error",
-                f"Failed to rebuild library:\n{e}"
-            )
\ No newline at end of file
+    def on_scan_failed(self, message):
+        self.header_label.setText(self.scan_header)
+        self.header_label.setToolTip("")
+        QMessageBox.critical(
+            self,
+            "Reload Error",
+            f"Failed to rebuild library:\n{message}"
+        )
+
+    def _on_scan_thread_done(self):
+        self.scan_worker.deleteLater()
+        self.scan_worker = None
+        self.reload_btn.setEnabled(True)
+        self.reload_btn.setText("Reload Library")
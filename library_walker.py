@@ -0,0 +1,188 @@
+# library_walker.py — scandir walker that prunes unchanged directories
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import AUDIO_EXTS, DIR_INDEX_DIR, SCAN_WALK_WORKERS
+
+
+# A directory whose mtime is this fresh may still change within the
+# filesystem's timestamp granularity (2 s on FAT), so never trust it.
+MTIME_SETTLE_NS = 2_000_000_000
+
+INDEX_VERSION = 1
+
+
+# ----------------------------------------------------------
+# Persisted directory index (one small JSON per root and consumer)
+# Each consumer ("library" scanner, "sync" tab) keeps its own index:
+# a directory is only "unchanged" relative to that consumer's last look.
+# ----------------------------------------------------------
+def _index_path(root, name):
+    key = hashlib.sha1(os.path.normcase(os.path.abspath(root)).encode("utf-8")).hexdigest()
+    return os.path.join(DIR_INDEX_DIR, f"{name}_{key}.json")
+
+
+def load_dir_index(root, name="library"):
+    """{dir: {"mtime_ns", "subdirs", "files"}} from the last complete walk of root."""
+    try:
+        with open(_index_path(root, name), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return {}
+    if data.get("version") != INDEX_VERSION or data.get("root") != root:
+        return {}
+    return data.get("dirs", {})
+
+
+def save_dir_index(root, dirs, name="library"):
+    """Atomically replace root's directory index."""
+    path = _index_path(root, name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": INDEX_VERSION, "root": root, "dirs": dirs}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# ----------------------------------------------------------
+# Walking
+# ----------------------------------------------------------
+def _is_audio(name):
+    return os.path.splitext(name)[1].lower() in AUDIO_EXTS
+
+
+def _visit(d, cached, full):
+    """
+    Return (files, subdirs, index_entry, listed) for one directory.
+    files maps path -> {"file_size", "mtime_ns"}. An unchanged directory
+    is not listed again, but its known files are still stat'ed: an
+    in-place retag changes the file's mtime, not the folder's.
+    """
+    try:
+        st = os.stat(d)
+    except OSError:
+        return None
+
+    if not full and cached and cached.get("mtime_ns") == st.st_mtime_ns:
+        files = {}
+        for name in cached["files"]:
+            path = os.path.join(d, name)
+            try:
+                fst = os.stat(path)
+            except OSError:
+                continue
+            files[path] = {"file_size": fst.st_size, "mtime_ns": fst.st_mtime_ns}
+        return files, cached["subdirs"], cached, False
+
+    files, names, subdirs = {}, [], []
+    try:
+        with os.scandir(d) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif _is_audio(entry.name):
+                        # DirEntry.stat() is free on Windows (comes with the listing)
+                        est = entry.stat()
+                        files[entry.path] = {"file_size": est.st_size, "mtime_ns": est.st_mtime_ns}
+                        names.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        return None
+
+    settled = time.time_ns() - st.st_mtime_ns > MTIME_SETTLE_NS
+    index_entry = {
+        "mtime_ns": st.st_mtime_ns if settled else None,
+        "subdirs": sorted(subdirs),
+        "files": sorted(names),
+    }
+    return files, index_entry["subdirs"], index_entry, True
+
+
+def _walk_subtree(top, old_index, full, cancel, on_dir):
+    files, new_index = {}, {}
+    listed = 0
+    stack = [top]
+    while stack:
+        if cancel is not None and cancel.is_set():
+            return files, new_index, listed, False
+        d = stack.pop()
+        visited = _visit(d, old_index.get(d), full)
+        if visited is None:
+            continue
+        dir_files, subdirs, index_entry, was_listed = visited
+        files.update(dir_files)
+        new_index[d] = index_entry
+        listed += was_listed
+        stack.extend(os.path.join(d, name) for name in reversed(subdirs))
+        if on_dir:
+            on_dir(d, len(dir_files))
+    return files, new_index, listed, True
+
+
+def walk_library(root, full=False, cancel=None, on_dir=None, workers=None, index_name="library"):
+    """
+    Find every supported audio file under root.
+
+    Directories whose mtime matches the last walk are not listed again;
+    their known files are only stat'ed, so a rescan costs one stat per
+    directory and per file plus a listing of each changed directory.
+    Top-level folders are walked concurrently. full=True ignores the
+    saved index.
+
+    Returns {"files": {path: fingerprint}, "complete": bool,
+             "index": {...}, "dirs_total": n, "dirs_listed": n}.
+    The caller persists "index" with save_dir_index(root, index,
+    index_name) once its results are safely committed.
+    """
+    workers = workers or SCAN_WALK_WORKERS
+    old_index = {} if full else load_dir_index(root, index_name)
+    lock = threading.Lock()
+
+    def locked_on_dir(d, count):
+        if on_dir:
+            with lock:
+                on_dir(d, count)
+
+    result = {"files": {}, "complete": True, "index": {}, "dirs_total": 0, "dirs_listed": 0}
+
+    visited = _visit(root, old_index.get(root), full)
+    if visited is None:
+        return result
+    files, subdirs, index_entry, was_listed = visited
+    result["files"].update(files)
+    result["index"][root] = index_entry
+    result["dirs_listed"] += was_listed
+    locked_on_dir(root, len(files))
+
+    tops = [os.path.join(root, name) for name in subdirs]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        parts = pool.map(
+            lambda top: _walk_subtree(top, old_index, full, cancel, locked_on_dir), tops
+        )
+        # merge in top-level order so results are deterministic
+        for sub_files, sub_index, listed, complete in parts:
+            result["files"].update(sub_files)
+            result["index"].update(sub_index)
+            result["dirs_listed"] += listed
+            result["complete"] = result["complete"] and complete
+
+    result["dirs_total"] = len(result["index"])
+    return result
+
+
+def list_audio_files(root, index_name="sync"):
+    """Sorted audio file paths under root, using (and refreshing) the index."""
+    if not os.path.isdir(root):
+        return []
+    walk = walk_library(root, index_name=index_name)
+    if walk["complete"]:
+        try:
+            save_dir_index(root, walk["index"], index_name)
+        except Exception:
+            pass
+    return sorted(walk["files"])
@@ -0,0 +1,274 @@
+# library_watcher.py — live, incremental library updates
+import os
+import threading
+from collections import defaultdict
+
+from PyQt5.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal
+
+from config import (
+    AUDIO_EXTS,
+    LIBRARY_WATCH_DEBOUNCE_MS,
+    LIBRARY_POLL_INTERVAL_MS,
+    LIBRARY_WATCH_MAX_DIRS,
+    LIBRARY_MODIFY_SWEEP_MS,
+)
+from metadata_store import open_metadata_store
+from safe_print import safe_print
+
+
+def _is_audio(name):
+    return os.path.splitext(name)[1].lower() in AUDIO_EXTS
+
+
+def _fingerprint(entry):
+    """(size, mtime_ns) from a DirEntry, or None if it vanished."""
+    try:
+        st = entry.stat()
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class LibraryWatcher(QObject):
+    """
+    Watches a music folder and pushes metadata deltas as files appear,
+    change, move or disappear.
+
+    Native notifications come from QFileSystemWatcher (inotify on Linux,
+    ReadDirectoryChangesW on Windows). If the platform refuses the watches,
+    or the tree has more than LIBRARY_WATCH_MAX_DIRS folders, it falls back
+    to polling directory mtimes, which costs one stat per folder per tick.
+    Both only see names change (add / remove / rename), so a slower sweep
+    re-stats the known files every LIBRARY_MODIFY_SWEEP_MS to catch
+    in-place edits such as retagging.
+
+    Events are debounced into batches; each batch lists only the dirty
+    folders, extracts only new/changed files and emits:
+        changes_ready({"upserts": {path: entry}, "removed": [path, ...]})
+    """
+
+    changes_ready = pyqtSignal(dict)
+    _scan_finished = pyqtSignal(list)
+    _dirs_changed = pyqtSignal(list)
+
+    def __init__(self, root_folder, parent=None):
+        super().__init__(parent)
+        self.root_folder = os.path.normpath(root_folder)
+
+        self.known = defaultdict(dict)   # dir -> {path: (size, mtime_ns)}
+        self.dir_mtimes = {}             # dir -> mtime_ns (polling mode)
+        self.dirty = set()
+        self.polling = False
+        self._busy = False
+        self._stopped = False
+
+        self.fs_watcher = QFileSystemWatcher(self)
+        self.fs_watcher.directoryChanged.connect(self._on_directory_changed)
+
+        self.debounce = QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(LIBRARY_WATCH_DEBOUNCE_MS)
+        self.debounce.timeout.connect(self._flush)
+
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(LIBRARY_POLL_INTERVAL_MS)
+        self.poll_timer.timeout.connect(self._poll)
+
+        self.sweep_timer = QTimer(self)
+        self.sweep_timer.setInterval(LIBRARY_MODIFY_SWEEP_MS)
+        self.sweep_timer.timeout.connect(self._sweep)
+
+        self._scan_finished.connect(self._on_scan_finished)
+        self._dirs_changed.connect(self._on_dirs_changed)
+
+    # ---------- lifecycle ----------
+    def start(self):
+        """Seed state from the metadata store and start watching (non-blocking)."""
+        if not os.path.isdir(self.root_folder):
+            safe_print(f"Library watcher: folder not found: {self.root_folder}")
+            return
+        self._busy = True
+        threading.Thread(target=self._seed_thread, daemon=True).start()
+        self.sweep_timer.start()
+
+    def stop(self):
+        self._stopped = True
+        self.debounce.stop()
+        self.poll_timer.stop()
+        self.sweep_timer.stop()
+        dirs = self.fs_watcher.directories()
+        if dirs:
+            self.fs_watcher.removePaths(dirs)
+
+    def _seed_thread(self):
+        # known files come from the store: no per-file stat at startup
+        try:
+            store = open_metadata_store()
+            try:
+                metadata = store.load_all()
+            finally:
+                store.close()
+        except Exception:
+            metadata = {}
+
+        if isinstance(metadata, dict):
+            for path, entry in metadata.items():
+                self.known[os.path.dirname(path)][path] = (
+                    entry.get("file_size"), entry.get("mtime_ns")
+                )
+
+        new_dirs = []
+        for root, dirs, _ in os.walk(self.root_folder):
+            new_dirs.append(root)
+            self.known.setdefault(root, {})
+            try:
+                self.dir_mtimes[root] = os.stat(root).st_mtime_ns
+            except OSError:
+                pass
+
+        self._scan_finished.emit(new_dirs)
+
+    # ---------- event intake ----------
+    def _on_directory_changed(self, path):
+        self.dirty.add(os.path.normpath(path))
+        self.debounce.start()
+
+    def _poll(self):
+        if self._busy:
+            return
+        self._busy = True
+        threading.Thread(target=self._poll_thread, daemon=True).start()
+
+    def _poll_thread(self):
+        changed = []
+        for d, old in list(self.dir_mtimes.items()):
+            try:
+                mtime = os.stat(d).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != old:
+                changed.append(d)
+        self._dirs_changed.emit(changed)
+
+    def _sweep(self):
+        if self._busy:
+            return
+        self._busy = True
+        threading.Thread(target=self._sweep_thread, daemon=True).start()
+
+    def _sweep_thread(self):
+        # folders whose files changed size/mtime get re-listed by a normal batch
+        changed = []
+        for d, files in list(self.known.items()):
+            for path, old in list(files.items()):
+                try:
+                    st = os.stat(path)
+                    fp = (st.st_size, st.st_mtime_ns)
+                except OSError:
+                    fp = None
+                if fp != old:
+                    changed.append(d)
+                    break
+        self._dirs_changed.emit(changed)
+
+    # ---------- batch processing ----------
+    def _flush(self):
+        if self._busy:
+            # a batch is running; try again once it finishes
+            self.debounce.start()
+            return
+        self._flush_now()
+
+    def _flush_now(self):
+        if not self.dirty or self._stopped:
+            return
+        batch, self.dirty = self.dirty, set()
+        self._busy = True
+        threading.Thread(target=self._process_batch, args=(batch,), daemon=True).start()
+
+    def _process_batch(self, batch):
+        from tag_extractor import apply_file_changes
+
+        changed, removed, new_dirs = [], [], []
+        pending = list(batch)
+
+        while pending:
+            d = pending.pop()
+            before = self.known.get(d, {})
+            now, subdirs = {}, set()
+            try:
+                with os.scandir(d) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.add(entry.path)
+                            if entry.path not in self.known:
+                                # newly copied folder: scan its whole subtree
+                                self.known[entry.path] = {}
+                                new_dirs.append(entry.path)
+                                pending.append(entry.path)
+                        elif _is_audio(entry.name):
+                            now[entry.path] = _fingerprint(entry)
+                self.dir_mtimes[d] = os.stat(d).st_mtime_ns
+            except OSError:
+                # folder deleted or moved away: everything below it is gone
+                prefix = d + os.sep
+                for sub in [k for k in self.known if k == d or k.startswith(prefix)]:
+                    removed.extend(self.known.pop(sub))
+                    self.dir_mtimes.pop(sub, None)
+                continue
+
+            # known subfolders that vanished get handled as deleted folders
+            pending.extend(
+                k for k in list(self.known)
+                if os.path.dirname(k) == d and k != d and k not in subdirs
+            )
+
+            for path, fp in now.items():
+                if before.get(path) != fp:
+                    changed.append(path)
+            removed.extend(p for p in before if p not in now)
+            self.known[d] = now
+
+        delta = {"upserts": {}, "removed": []}
+        if changed or removed:
+            try:
+                delta = apply_file_changes(changed, removed)
+            except Exception as e:
+                safe_print(f"Library watcher failed to apply changes: {e}")
+
+        if delta["upserts"] or delta["removed"]:
+            safe_print(
+                f"Library watcher: {len(delta['upserts'])} updated, "
+                f"{len(delta['removed'])} removed"
+            )
+            self.changes_ready.emit(delta)
+
+        self._scan_finished.emit(new_dirs)
+
+    # ---------- back on the GUI thread ----------
+    def _on_dirs_changed(self, changed):
+        # poll / sweep results: dirty and _busy are only touched here
+        self._busy = False
+        if self._stopped:
+            return
+        self.dirty.update(changed)
+        self._flush_now()
+
+    def _on_scan_finished(self, new_dirs):
+        self._busy = False
+        if self._stopped:
+            return
+
+        if new_dirs and not self.polling:
+            total = len(self.fs_watcher.directories()) + len(new_dirs)
+            failed = self.fs_watcher.addPaths(new_dirs) if total <= LIBRARY_WATCH_MAX_DIRS else new_dirs
+            if failed:
+                safe_print("Library watcher: native notifications unavailable, polling instead.")
+                self.polling = True
+                dirs = self.fs_watcher.directories()
+                if dirs:
+                    self.fs_watcher.removePaths(dirs)
+                self.poll_timer.start()
+
+        if self.dirty:
+            self.debounce.start()
@@ -0,0 +1,37 @@
+# load_worker.py — load the full track table off the GUI thread
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class LibraryLoadWorker(QThread):
+    """
+    Background metadata load (startup, and the reload after a rescan).
+    The search index is built and the browse index rewritten here too,
+    before the table is handed to the GUI thread.
+    loaded(object, object) -> (TrackTable, metadata signature read before loading)
+    failed(str) -> error message
+    """
+
+    loaded = pyqtSignal(object, object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, open_store, parent=None):
+        super().__init__(parent)
+        # a factory, not a store: SQLite connections belong to the thread that opens them
+        self.open_store = open_store
+
+    def run(self):
+        try:
+            from track_store import TrackTable
+            from library_index import save_browse_index
+            store = self.open_store()
+            try:
+                signature = store.signature()
+                table = TrackTable.load(store)
+            finally:
+                store.close()
+            table.build_search_index()
+            save_browse_index(table, signature)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.loaded.emit(table, signature)
@@ -1,4 +1,6 @@
 import sys, time, os
+import locale
+import multiprocessing
 
 # ----------------------------------------------------------
 # Prevent PyInstaller first-run extraction errors
@@ -23,12 +25,17 @@
 from playlist_tab import PlaylistTab
 from library_tab import LibraryTab
 from sync_tab import SyncTab
+from library_watcher import LibraryWatcher
+from analysis_worker import AnalysisWorker
+from track_store import TrackTable
 from config import (
     ROAMING_DIR,
     LOCAL_DIR,
     ONEDRIVE_DATA_DIR,
     DEFAULT_MUSIC_DIR,
     APP_NAME,
+    LIBRARY_WATCH_ENABLED,
+    LOUDNESS_ANALYSIS_ENABLED,
 )
 
 # ----------------------------------------------------------
@@ -120,7 +127,7 @@
 }
 
 /* --- Lists --- */
-QListWidget {
+QListWidget, QListView {
     border: 1px solid #00FF33;
     border-radius: 10px;
     background-color: #000000;
@@ -196,7 +203,9 @@ def __init__(self):
         self.setCentralWidget(self.tabs)
 
         # --- Player Tab ---
-        self.player_tab = PlayerTab()
+        # one track table for Player + Library (LibraryTab fills it on a worker thread)
+        self.tracks = TrackTable()
+        self.player_tab = PlayerTab(self.tracks)
         self.tabs.addTab(self.player_tab, "🎵 Player")
 
         # --- Playlist Tab ---
@@ -208,18 +217,92 @@ def __init__(self):
             DEFAULT_MUSIC_DIR,
             add_to_player_queue_callback=self.player_tab.add_song_to_queue,
             add_to_playlist_queue_callback=self.playlist_tab.add_to_playlist_queue,
+            tracks=self.tracks,
+            load_async=True,
         )
         self.tabs.addTab(self.library_tab, "📚 Library")
+        self.library_tab.paths_moved.connect(self.player_tab.apply_path_moves)
+        self.library_tab.paths_moved.connect(self.playlist_tab.apply_path_moves)
+        # LibraryTab owns the shared table; the player only follows its deltas
+        self.library_tab.tracks_updated.connect(self.player_tab.apply_metadata_delta)
 
         # --- Sync Tab ---
         self.sync_tab = SyncTab()
         self.tabs.addTab(self.sync_tab, "☁️ Sync")
 
+        # --- Live library watcher (pushes deltas, no full reload) ---
+        self.library_watcher = LibraryWatcher(DEFAULT_MUSIC_DIR, self)
+        self.library_watcher.changes_ready.connect(self.library_tab.apply_metadata_delta)
+        self.library_watcher.changes_ready.connect(self.playlist_tab.apply_metadata_delta)
+        if LIBRARY_WATCH_ENABLED:
+            self.library_watcher.start()
+
+        # --- Background audio analysis: loudness + waveforms for new tracks ---
+        self.analysis_worker = None
+        self.analysis_pending = False
+        if LOUDNESS_ANALYSIS_ENABLED:
+            self.library_tab.scan_completed.connect(self.start_analysis)
+            self.library_tab.library_loaded.connect(self.start_analysis)
+            self.library_watcher.changes_ready.connect(self.start_analysis)
+            self.start_analysis()
+
+    def start_analysis(self, *_):
+        if self.analysis_worker is not None or self.library_tab.load_worker is not None:
+            # already running, or the track table is still loading: go again once it's done
+            self.analysis_pending = True
+            return
+        self.analysis_pending = False
+        self.analysis_worker = AnalysisWorker(self)
+        # keeps the table and the persisted browse index in step with the store
+        self.analysis_worker.analyzed.connect(self.library_tab.apply_metadata_delta)
+        self.analysis_worker.finished_analysis.connect(self.on_analysis_finished)
+        self.analysis_worker.failed.connect(
+            lambda message: safe_print(f"Audio analysis failed: {message}")
+        )
+        self.analysis_worker.finished.connect(self._on_analysis_thread_done)
+        self.analysis_worker.start()
+
+    def on_analysis_finished(self, result):
+        if result["total"]:
+            safe_print(
+                f"Audio analysis: {result['analyzed']}/{result['total']} tracks "
+                f"in {result['elapsed_s']}s ({result['tracks_per_sec']} tracks/s)"
+            )
+
+    def _on_analysis_thread_done(self):
+        self.analysis_worker.deleteLater()
+        self.analysis_worker = None
+        if self.analysis_pending:
+            self.start_analysis()
+
+    def closeEvent(self, event):
+        self.library_watcher.stop()
+        if self.analysis_worker is not None:
+            self.analysis_pending = False
+            self.analysis_worker.cancel()
+            self.analysis_worker.wait()
+        if self.library_tab.scan_worker is not None:
+            # partial results are committed before the thread ends
+            self.library_tab.scan_worker.cancel()
+            self.library_tab.scan_worker.wait()
+        if self.library_tab.load_worker is not None:
+            self.library_tab.load_worker.wait()
+        super().closeEvent(event)
+
 
 # ----------------------------------------------------------
 # Application Entry Point
 # ----------------------------------------------------------
 if __name__ == "__main__":
+    # required for process-pool scans inside the frozen EXE
+    multiprocessing.freeze_support()
+
+    # artist/album/genre lists collate by the user's locale (track_store.name_sort_key)
+    try:
+        locale.setlocale(locale.LC_COLLATE, "")
+    except Exception as e:
+        safe_print(f"⚠️ Using default collation: {e}")
+
     app = QApplication(sys.argv)
 
     # Apply embedded Matrix-style theme
@@ -0,0 +1,412 @@
+# metadata_store.py — JSON or SQLite persistence for music metadata
+import os
+import json
+import uuid
+import sqlite3
+
+from config import METADATA_FILE, METADATA_DB, METADATA_BACKEND
+from safe_print import safe_print
+
+
+# ----------------------------------------------------------
+# Track columns (anything else in an entry goes to "extra")
+# ----------------------------------------------------------
+TRACK_COLUMNS = [
+    "title", "album_artist", "album", "publisher", "disc_number",
+    "track_number", "total_discs", "year", "genre", "composer",
+    "artwork", "file_size", "mtime_ns",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS artwork (
+    path TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS albums (
+    id           INTEGER PRIMARY KEY,
+    album_artist TEXT NOT NULL,
+    album        TEXT NOT NULL,
+    artwork      TEXT,
+    UNIQUE (album_artist, album)
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    path         TEXT PRIMARY KEY,
+    album_id     INTEGER REFERENCES albums(id),
+    title        TEXT,
+    album_artist TEXT,
+    album        TEXT,
+    publisher    TEXT,
+    disc_number  TEXT,
+    track_number TEXT,
+    total_discs  TEXT,
+    year         TEXT,
+    genre        TEXT,
+    composer     TEXT,
+    artwork      TEXT,
+    file_size    INTEGER,
+    mtime_ns     INTEGER,
+    extra        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tracks_artist ON tracks(album_artist);
+CREATE INDEX IF NOT EXISTS idx_tracks_album  ON tracks(album);
+CREATE INDEX IF NOT EXISTS idx_tracks_genre  ON tracks(genre);
+CREATE INDEX IF NOT EXISTS idx_tracks_year   ON tracks(year);
+CREATE INDEX IF NOT EXISTS idx_tracks_album_id ON tracks(album_id);
+CREATE INDEX IF NOT EXISTS idx_tracks_artwork ON tracks(artwork);
+"""
+
+# ----------------------------------------------------------
+# Canonical entry schema
+# ----------------------------------------------------------
+# Version 2: every entry uses the keys below. Older files may carry
+# hand-edited / legacy spellings ("Album Artist", "artwork_path",
+# "TrackNumber", ...); they are mapped once at load, and the version is
+# stamped into the file on the next commit so later loads skip the pass.
+METADATA_SCHEMA_VERSION = 2
+SCHEMA_VERSION = str(METADATA_SCHEMA_VERSION)   # as kept in the SQLite meta table
+SCHEMA_KEY = "__schema__"   # reserved top-level key in music_metadata.json
+
+CANONICAL_KEYS = frozenset(TRACK_COLUMNS) | {
+    "path", "duration", "bitrate", "sample_rate", "channels", "codec",
+    "content_id", "loudness", "peak", "loudness_blocks", "album_loudness",
+    "loudness_key", "waveform",
+}
+
+# legacy spelling (lowercased, spaces -> "_") -> canonical key
+LEGACY_KEYS = {
+    "file_path": "path",
+    "artist": "album_artist",
+    "albumartist": "album_artist",
+    "track": "track_number",
+    "tracknumber": "track_number",
+    "track_#": "track_number",
+    "artwork_path": "artwork",
+    "art_path": "artwork",
+    "artworkpath": "artwork",
+}
+
+TEXT_KEYS = frozenset(TRACK_COLUMNS) - {"file_size", "mtime_ns"}
+
+
+def normalize_entry(entry):
+    """
+    Copy of entry with legacy keys mapped onto the canonical schema.
+    Canonical keys win over aliases; unknown keys are kept untouched.
+    """
+    out = {k: v for k, v in entry.items() if k in CANONICAL_KEYS}
+    for key, value in entry.items():
+        if key in CANONICAL_KEYS:
+            continue
+        folded = key.strip().lower().replace(" ", "_")
+        canonical = LEGACY_KEYS.get(folded, folded)
+        if canonical not in CANONICAL_KEYS:
+            out[key] = value
+        elif canonical not in out:
+            out[canonical] = value
+    for key in TEXT_KEYS & out.keys():
+        value = out[key]
+        if isinstance(value, (list, tuple)):
+            value = value[0] if value else ""
+        if value is None:
+            value = ""
+        out[key] = value if isinstance(value, str) else str(value)
+    return out
+
+
+def normalize_metadata(data):
+    """{path: canonical entry} from any format music_metadata.json has had."""
+    if isinstance(data, list):
+        # very old files: a list of {"path": ..., tags}
+        entries = (normalize_entry(s) for s in data if isinstance(s, dict))
+        return {e.pop("path"): e for e in entries if e.get("path")}
+    if not isinstance(data, dict):
+        return {}
+    data.pop(SCHEMA_KEY, None)
+    metadata = {}
+    for path, entry in data.items():
+        if isinstance(entry, dict):
+            entry = normalize_entry(entry)
+            entry.pop("path", None)
+            metadata[path] = entry
+    return metadata
+
+
+def _stat_signature(path):
+    """Cheap change marker for cache invalidation: [size, mtime_ns], or None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+# ----------------------------------------------------------
+# JSON backend (original format: one dict keyed by path)
+# ----------------------------------------------------------
+class JSONMetadataStore:
+    def __init__(self, path=METADATA_FILE):
+        self.path = path
+
+    def load_all(self):
+        """Return {path: entry}. Missing or unreadable files give {}."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return {}
+        if isinstance(data, dict):
+            stamp = data.get(SCHEMA_KEY)
+            if isinstance(stamp, dict) and stamp.get("version") == METADATA_SCHEMA_VERSION:
+                del data[SCHEMA_KEY]
+                return data
+        return normalize_metadata(data)
+
+    def signature(self):
+        """[size, mtime_ns] of the file: changes whenever commit() runs. None if missing."""
+        return _stat_signature(self.path)
+
+    def commit(self, metadata, changed=(), removed=()):
+        """
+        Persist the library. JSON has no partial writes, so write it all —
+        to a temp file first, so a crash can never leave a half-written
+        music_metadata.json in place of the good one.
+        """
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        stamped = {SCHEMA_KEY: {"version": METADATA_SCHEMA_VERSION}}
+        stamped.update(metadata)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stamped, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        pass
+
+
+# ----------------------------------------------------------
+# SQLite backend (row-level upserts, indexed lookups)
+# ----------------------------------------------------------
+class SQLiteMetadataStore:
+    def __init__(self, path=METADATA_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        # only write when something changes: an open must not alter signature()
+        if meta.get("schema_version") != SCHEMA_VERSION:
+            if "schema_version" in meta:
+                self._upgrade_entries()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                (SCHEMA_VERSION,)
+            )
+        if "store_id" not in meta:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('store_id', ?)", (uuid.uuid4().hex,)
+            )
+        self.conn.commit()
+
+    def _upgrade_entries(self):
+        """v1 -> v2: legacy keys that landed in "extra" move to their columns."""
+        metadata = self.load_all()
+        changed = {}
+        for path, entry in metadata.items():
+            canonical = normalize_entry(entry)
+            canonical.pop("path", None)
+            if canonical != entry:
+                changed[path] = canonical
+        with self.conn:
+            self.upsert_many(changed)
+        if changed:
+            safe_print(f"Upgraded {len(changed)} metadata entries to schema v{SCHEMA_VERSION}")
+
+    # ---------- reads ----------
+    def load_all(self):
+        cols = ", ".join(TRACK_COLUMNS)
+        rows = self.conn.execute(f"SELECT path, {cols}, extra FROM tracks ORDER BY path")
+        return {row[0]: self._row_to_entry(row) for row in rows}
+
+    def signature(self):
+        """
+        [store_id, generation]: generation is bumped by every write, so this
+        changes exactly when the tracks do (not on open/close checkpoints).
+        """
+        meta = dict(self.conn.execute(
+            "SELECT key, value FROM meta WHERE key IN ('store_id', 'generation')"
+        ))
+        return [meta.get("store_id"), int(meta.get("generation") or 0)]
+
+    def get(self, path):
+        cols = ", ".join(TRACK_COLUMNS)
+        row = self.conn.execute(
+            f"SELECT path, {cols}, extra FROM tracks WHERE path = ?", (path,)
+        ).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def tracks_where(self, column, value):
+        """Paths of tracks whose indexed column equals value."""
+        if column not in ("album_artist", "album", "genre", "year"):
+            raise ValueError(f"Not an indexed column: {column}")
+        rows = self.conn.execute(
+            f"SELECT path FROM tracks WHERE {column} = ? ORDER BY path", (value,)
+        )
+        return [r[0] for r in rows]
+
+    @staticmethod
+    def _row_to_entry(row):
+        entry = {}
+        for col, value in zip(TRACK_COLUMNS, row[1:]):
+            if value is not None:
+                entry[col] = value
+        if row[-1]:
+            entry.update(json.loads(row[-1]))
+        return entry
+
+    # ---------- writes ----------
+    def commit(self, metadata, changed=(), removed=()):
+        """Upsert only the changed paths and delete removed ones, in one transaction."""
+        with self.conn:
+            self.delete_many(removed)
+            self.upsert_many({p: metadata[p] for p in changed if p in metadata})
+
+    def upsert_many(self, entries):
+        placeholders = ", ".join("?" for _ in TRACK_COLUMNS)
+        cols = ", ".join(TRACK_COLUMNS)
+        albums, artwork = self._row_refs(entries)
+        for path, entry in entries.items():
+            album_id = self._album_id(entry)
+            values, extra = [], {}
+            for col in TRACK_COLUMNS:
+                value = entry.get(col)
+                if isinstance(value, (list, dict)):
+                    extra[col] = value
+                    value = None
+                values.append(value)
+            for key, value in entry.items():
+                if key not in TRACK_COLUMNS:
+                    extra[key] = value
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO tracks (path, album_id, {cols}, extra) "
+                f"VALUES (?, ?, {placeholders}, ?)",
+                [path, album_id, *values, json.dumps(extra, ensure_ascii=False) if extra else None]
+            )
+        if entries:
+            self._bump_generation()
+        self._prune_orphans(albums, artwork)
+
+    def delete_many(self, paths):
+        paths = list(paths)
+        albums, artwork = self._row_refs(paths)
+        self.conn.executemany("DELETE FROM tracks WHERE path = ?", [(p,) for p in paths])
+        if paths:
+            self._bump_generation()
+        self._prune_orphans(albums, artwork)
+
+    def _bump_generation(self):
+        # part of the caller's transaction, so it commits (or rolls back) with the rows
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('generation', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    def _album_id(self, entry):
+        artist = str(entry.get("album_artist") or "")
+        album = str(entry.get("album") or "")
+        art = entry.get("artwork") or ""
+        if art:
+            self.conn.execute("INSERT OR IGNORE INTO artwork (path) VALUES (?)", (art,))
+        self.conn.execute(
+            "INSERT OR IGNORE INTO albums (album_artist, album, artwork) VALUES (?, ?, ?)",
+            (artist, album, art)
+        )
+        if art:
+            self.conn.execute(
+                "UPDATE albums SET artwork = ? WHERE album_artist = ? AND album = ? "
+                "AND (artwork IS NULL OR artwork = '')",
+                (art, artist, album)
+            )
+        return self.conn.execute(
+            "SELECT id FROM albums WHERE album_artist = ? AND album = ?", (artist, album)
+        ).fetchone()[0]
+
+    def _row_refs(self, paths):
+        """(album ids, artwork paths) the existing rows for paths point at."""
+        albums, artwork = set(), set()
+        for path in paths:
+            row = self.conn.execute(
+                "SELECT album_id, artwork FROM tracks WHERE path = ?", (path,)
+            ).fetchone()
+            if row:
+                albums.add(row[0])
+                if row[1]:
+                    artwork.add(row[1])
+        return albums, artwork
+
+    def _prune_orphans(self, albums, artwork):
+        # only rows that were just replaced or deleted can have orphaned these
+        self.conn.executemany(
+            "DELETE FROM albums WHERE id = ? AND NOT EXISTS "
+            "(SELECT 1 FROM tracks WHERE album_id = ?)",
+            [(album_id, album_id) for album_id in albums]
+        )
+        self.conn.executemany(
+            "DELETE FROM artwork WHERE path = ? AND NOT EXISTS "
+            "(SELECT 1 FROM tracks WHERE artwork = ?)",
+            [(path, path) for path in artwork]
+        )
+
+    def backup_to(self, dest_path):
+        """Consistent copy of the live database (safe while WAL is in use)."""
+        dest = sqlite3.connect(dest_path)
+        try:
+            self.conn.backup(dest)
+        finally:
+            dest.close()
+
+    def close(self):
+        self.conn.close()
+
+
+# ----------------------------------------------------------
+# One-shot migration from music_metadata.json
+# ----------------------------------------------------------
+def migrate_json_to_sqlite(json_path=METADATA_FILE, db_path=METADATA_DB):
+    """Copy every entry from the JSON file into the SQLite store. Returns row count."""
+    metadata = JSONMetadataStore(json_path).load_all()
+    if not isinstance(metadata, dict):
+        metadata = {}
+
+    store = SQLiteMetadataStore(db_path)
+    try:
+        with store.conn:
+            store.upsert_many(metadata)
+            store.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+                (json_path,)
+            )
+    finally:
+        store.close()
+
+    safe_print(f"Migrated {len(metadata)} tracks from {json_path} to {db_path}")
+    return len(metadata)
+
+
+# ----------------------------------------------------------
+# Factory used by the scanner and the tabs
+# ----------------------------------------------------------
+def open_metadata_store(backend=None):
+    """Open the configured backend, migrating JSON -> SQLite on first use."""
+    backend = backend or METADATA_BACKEND
+
+    if backend == "sqlite":
+        if not os.path.exists(METADATA_DB) and os.path.exists(METADATA_FILE):
+            migrate_json_to_sqlite(METADATA_FILE, METADATA_DB)
+        return SQLiteMetadataStore(METADATA_DB)
+
+    return JSONMetadataStore(METADATA_FILE)
@@ -1,29 +1,33 @@
 import os
 os.environ["SDL_AUDIODRIVER"] = "directsound"
 
-import json
 import pygame
-from mutagen.mp3 import MP3
+import mutagen
 
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QListWidget, QLabel, QProgressBar,
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QListWidget, QLabel,
     QGraphicsDropShadowEffect, QFrame
 )
 from PyQt5.QtCore import QTimer, Qt, QEvent, QTime
 from PyQt5.QtGui import QFont, QPixmap, QColor
 
-from config import ROAMING_DIR, LOCAL_DIR
+from config import ROAMING_DIR
+from artwork_cache import best_artwork_path
+from audio_analysis import replay_gain_volume, load_waveform
 from safe_print import safe_print
+from track_store import TrackTable
+from waveform_widget import WaveformSeekBar
 
 
 class PlayerTab(QWidget):
-    def __init__(self):
+    def __init__(self, tracks=None):
         super().__init__()
         pygame.mixer.init()
 
         # -------- Load metadata --------
+        # MainWindow shares the LibraryTab's table; standalone we load our own
         self.metadata_path = os.path.join(ROAMING_DIR, "music_metadata.json")
-        self.metadata = self.load_metadata()
+        self.tracks = tracks if tracks is not None else self.load_metadata()
 
         # -------- Main Layout --------
         self.layout = QHBoxLayout(self)
@@ -44,22 +48,11 @@ def __init__(self):
         self.play_button.clicked.connect(self.play_pause)
         self.player_layout.addWidget(self.play_button, alignment=Qt.AlignCenter)
 
-        # Progress bar
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setTextVisible(False)
+        # Progress bar (draws the track's waveform once it has been analysed)
+        self.progress_bar = WaveformSeekBar()
+        self.progress_bar.setRange(0, 1000)
         self.progress_bar.setValue(0)
-        self.progress_bar.setFixedHeight(15)
-        self.progress_bar.setStyleSheet("""
-            QProgressBar {
-                background-color: #1e1e1e;
-                border-radius: 8px;
-                border: 1px solid #333;
-            }
-            QProgressBar::chunk {
-                background-color: #39ff14;
-                border-radius: 8px;
-            }
-        """)
+        self.progress_bar.setFixedHeight(48)
         self.player_layout.addWidget(self.progress_bar)
 
         # Time label
@@ -165,10 +158,36 @@ def __init__(self):
     # -------------------------------------------------------------
     def load_metadata(self):
         try:
-            with open(self.metadata_path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            return TrackTable.load()
         except Exception:
-            return {}
+            return TrackTable()
+
+    def apply_metadata_delta(self, delta):
+        """Follow a delta LibraryTab already applied to the shared track table."""
+        self._follow_queue_moves(delta.get("moved", {}))
+        # analysis finished for the track that's playing: gain + waveform
+        if 0 <= self.current_index < len(self.queue) and self.queue[self.current_index] in delta.get("upserts", {}):
+            self.apply_replay_gain(self.queue[self.current_index])
+            self.progress_bar.setWaveform(load_waveform(self.tracks.get(self.queue[self.current_index])))
+
+    def apply_path_moves(self, moves):
+        """Follow moved/renamed files so the queue doesn't point at dead paths."""
+        if not moves:
+            return
+        self.tracks.move(moves)
+        self._follow_queue_moves(moves)
+
+    def _follow_queue_moves(self, moves):
+        for i, path in enumerate(self.queue):
+            if path in moves:
+                self.queue[i] = moves[path]
+                item = self.queue_list.item(i)
+                if item is not None:
+                    item.setText(os.path.basename(moves[path]))
+
+    def apply_replay_gain(self, song_path):
+        # pygame resets the music volume on every load()
+        pygame.mixer.music.set_volume(replay_gain_volume(self.tracks.get(song_path)))
 
     def set_album_art(self, artwork_path):
         if artwork_path and os.path.exists(artwork_path):
@@ -199,6 +218,7 @@ def clear_queue(self):
         self.song_label.setText("🧹 Queue cleared successfully.")
         self.time_label.setText("0:00 / 0:00")
         self.progress_bar.setValue(0)
+        self.progress_bar.setWaveform(None)
 
         # Reset info area
         self.set_album_art(None)
@@ -221,6 +241,7 @@ def play_song(self, index):
 
             try:
                 pygame.mixer.music.load(song_path)
+                self.apply_replay_gain(song_path)
                 pygame.mixer.music.play()
             except Exception as e:
                 self.song_label.setText(f"⚠️ Error playing: {os.path.basename(song_path)}")
@@ -231,23 +252,31 @@ def play_song(self, index):
             self.is_paused = False
             self.song_label.setText(f"🎵 Now Playing: {os.path.basename(song_path)}")
             self.progress_bar.setValue(0)
+            # precomputed overview, memory-mapped: no decoding at play time
+            self.progress_bar.setWaveform(load_waveform(self.tracks.get(song_path)))
             self.last_update_time = QTime.currentTime()
             self.last_pos = 0.0
             self.seek_offset = 0.0
 
-            # --- Duration ---
-            try:
-                audio = MP3(song_path)
-                self.total_length = audio.info.length
-            except Exception:
-                self.total_length = 0
+            # --- Duration (scanned ahead of time; parse only unknown files) ---
+            self.total_length = self.track_length(song_path)
             self.time_label.setText(f"0:00 / {self.format_time(self.total_length)}")
 
             # --- Metadata ---
             self.update_metadata_display(song_path)
 
+    def track_length(self, song_path):
+        entry = self.tracks.get(song_path) or {}
+        if entry.get("duration"):
+            return entry["duration"]
+        try:
+            audio = mutagen.File(song_path)
+            return audio.info.length if audio is not None else 0
+        except Exception:
+            return 0
+
     def update_metadata_display(self, song_path):
-        entry = self.metadata.get(song_path)
+        entry = self.tracks.get(song_path)
         if entry:
             self.labels["title"].setText(entry.get("title", "N/A"))
             self.labels["artist"].setText(entry.get("album_artist", "N/A"))
@@ -257,8 +286,7 @@ def update_metadata_display(self, song_path):
 
             art_path = entry.get("artwork")
             if art_path:
-                full_path = os.path.join(LOCAL_DIR, art_path)
-                self.set_album_art(full_path)
+                self.set_album_art(best_artwork_path(art_path, 200, 200))
             else:
                 self.set_album_art(None)
         else:
@@ -307,8 +335,8 @@ def update_progress(self):
         smoothed_pos = max(0, min(smoothed_pos, self.total_length))
         self.last_pos = smoothed_pos
 
-        progress = int((smoothed_pos / self.total_length) * 100)
-        self.progress_bar.setValue(min(progress, 100))
+        progress = int((smoothed_pos / self.total_length) * 1000)
+        self.progress_bar.setValue(min(progress, 1000))
         self.time_label.setText(
             f"{self.format_time(smoothed_pos)} / {self.format_time(self.total_length)}"
         )
@@ -327,7 +355,7 @@ def eventFilter(self, source, event):
                 self.playback_finished = False
                 self.last_update_time = QTime.currentTime()
                 self.last_pos = new_time
-                self.progress_bar.setValue(int(ratio * 100))
+                self.progress_bar.setValue(int(ratio * 1000))
                 self.time_label.setText(
                     f"{self.format_time(new_time)} / {self.format_time(self.total_length)}"
                 )
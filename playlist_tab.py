@@ -239,6 +239,25 @@ def load_playlist_to_player_queue(self, item):
         else:
             self._info(f"⚠️ Playlist '{name}' is empty.")
 
+    # ------------------------------------------------------------------
+    def apply_metadata_delta(self, delta):
+        self.apply_path_moves(delta.get("moved", {}))
+
+    def apply_path_moves(self, moves):
+        """
+        Files were moved/renamed. The scanner already rewrote playlists.json,
+        so reload it and fix up any paths sitting in the builder.
+        """
+        if not moves:
+            return
+        self.load_playlists()
+        for i, path in enumerate(self.playlist_queue):
+            if path in moves:
+                self.playlist_queue[i] = moves[path]
+                item = self.playlist_queue_list.item(i)
+                if item is not None:
+                    item.setText(os.path.basename(moves[path]))
+
     # ------------------------------------------------------------------
     def _info(self, message: str):
         """Display info messages in the header."""
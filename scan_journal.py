@@ -0,0 +1,103 @@
+# scan_journal.py — append-only checkpoints for long library scans
+import os
+import json
+import time
+
+from config import SCAN_JOURNAL, SCAN_CHECKPOINT_FILES, SCAN_CHECKPOINT_SECONDS
+
+
+JOURNAL_VERSION = 1
+
+
+class ScanJournal:
+    """
+    One JSON line per extracted file, fsync'ed every SCAN_CHECKPOINT_FILES
+    files or SCAN_CHECKPOINT_SECONDS seconds. A crash mid-scan loses at
+    most one checkpoint's worth of work: the next scan of the same root
+    calls load() and reuses every entry whose file hasn't changed since.
+    The journal is discarded once the scan is committed to the store.
+    """
+
+    def __init__(self, root, path=SCAN_JOURNAL,
+                 every_files=SCAN_CHECKPOINT_FILES, every_seconds=SCAN_CHECKPOINT_SECONDS):
+        self.root = root
+        self.path = path
+        self.every_files = every_files
+        self.every_seconds = every_seconds
+        self._file = None
+        self._valid_end = 0       # byte offset after the last complete line
+        self._unsynced = 0
+        self._last_sync = 0.0
+
+    # ---------- resume ----------
+    def load(self):
+        """{path: entry} journaled by an interrupted scan of this root."""
+        entries = {}
+        self._valid_end = 0
+        try:
+            with open(self.path, "rb") as f:
+                header = json.loads(f.readline())
+                if header.get("version") != JOURNAL_VERSION or header.get("root") != self.root:
+                    return {}
+                end = f.tell()
+                for line in f:
+                    # a crash can leave the last line half-written
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    entries[record["path"]] = record["entry"]
+                    end += len(line)
+                self._valid_end = end
+        except (OSError, ValueError, KeyError, AttributeError):
+            return {}
+        return entries
+
+    # ---------- writing ----------
+    def open(self):
+        """Start appending (after whatever load() accepted) or start a new journal."""
+        if self._valid_end:
+            self._file = open(self.path, "r+b")
+            self._file.truncate(self._valid_end)
+            self._file.seek(self._valid_end)
+        else:
+            self._file = open(self.path, "wb")
+            self._write({"version": JOURNAL_VERSION, "root": self.root})
+            self.checkpoint()
+        self._last_sync = time.monotonic()
+
+    def append(self, path, entry):
+        self._write({"path": path, "entry": entry})
+        self._unsynced += 1
+        if (self._unsynced >= self.every_files
+                or time.monotonic() - self._last_sync >= self.every_seconds):
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Make everything appended so far durable."""
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def close(self):
+        if self._file is not None:
+            self.checkpoint()
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """Drop the journal once its entries are safely in the store."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        self._valid_end = 0
@@ -0,0 +1,45 @@
+# scan_worker.py — run rebuild_music_metadata() off the GUI thread
+import time
+import threading
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class ScanWorker(QThread):
+    """
+    Background library scan.
+    progress(dict) -> {"seen", "extracted", "pending", "removed", "bytes_read", "current"}
+    finished_scan(dict) -> rebuild_music_metadata() result
+    failed(str) -> error message
+    """
+
+    progress = pyqtSignal(dict)
+    finished_scan = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    # don't flood the GUI event loop: at most ~20 progress updates / second
+    PROGRESS_INTERVAL = 0.05
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._cancel = threading.Event()
+        self._last_emit = 0.0
+
+    def cancel(self):
+        """Ask the scan to stop; partial results are still committed."""
+        self._cancel.set()
+
+    def _on_progress(self, stats):
+        now = time.monotonic()
+        if now - self._last_emit >= self.PROGRESS_INTERVAL or not stats.get("current"):
+            self._last_emit = now
+            self.progress.emit(stats)
+
+    def run(self):
+        try:
+            from tag_extractor import rebuild_music_metadata
+            result = rebuild_music_metadata(progress=self._on_progress, cancel=self._cancel)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished_scan.emit(result)
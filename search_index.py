@@ -0,0 +1,207 @@
+# search_index.py — diacritic-insensitive prefix search over the track table
+import re
+import sys
+import heapq
+import bisect
+import itertools
+import unicodedata
+from functools import lru_cache
+
+
+# Searchable fields and how much a hit in each counts towards the rank.
+# A whole-word hit counts double a prefix hit ("beat" vs "beatles").
+FIELD_WEIGHTS = {
+    "title": 8,
+    "album_artist": 6,
+    "album": 5,
+    "composer": 3,
+    "genre": 2,
+    "publisher": 1,
+}
+
+_WORD = re.compile(r"\w+")
+_MAX_CHAR = chr(sys.maxunicode)   # word + _MAX_CHAR sorts after every word it prefixes
+
+
+@lru_cache(maxsize=65536)
+def fold(text):
+    """Lowercase and strip diacritics: "Beyoncé" -> "beyonce", "Straße" -> "strasse"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+@lru_cache(maxsize=65536)
+def tokenize(text):
+    """Distinct folded word tokens of text, in order."""
+    return tuple(sys.intern(w) for w in dict.fromkeys(_WORD.findall(fold(text))))
+
+
+class _FieldPostings:
+    """token -> paths for one field, plus the tokens in sorted order for prefix ranges."""
+
+    __slots__ = ("paths", "tokens", "bulk")
+
+    def __init__(self):
+        self.paths = {}       # token -> (path,) or {path, ...}
+        self.tokens = []
+        self.bulk = False
+
+    def add(self, token, path):
+        paths = self.paths.get(token)
+        if paths is None:
+            # most tokens (track numbers, rare words) belong to one track
+            self.paths[token] = (path,)
+            if self.bulk:
+                self.tokens.append(token)
+            else:
+                bisect.insort(self.tokens, token)
+        elif isinstance(paths, tuple):
+            if path not in paths:
+                self.paths[token] = {paths[0], path}
+        else:
+            paths.add(path)
+
+    def remove(self, token, path):
+        paths = self.paths.get(token)
+        if paths is None:
+            return
+        if isinstance(paths, set):
+            paths.discard(path)
+            if paths:
+                return
+        elif paths[0] != path:
+            return
+        del self.paths[token]
+        i = bisect.bisect_left(self.tokens, token)
+        if i < len(self.tokens) and self.tokens[i] == token:
+            del self.tokens[i]
+
+    def matches(self, word):
+        """(whole-word paths, prefix-only paths) for word. Treat both as read-only."""
+        exact = self.paths.get(word, ())
+        lo = bisect.bisect_left(self.tokens, word)
+        hi = bisect.bisect_left(self.tokens, word + _MAX_CHAR, lo)
+        if exact:
+            lo += 1     # word itself sorts first in its own range
+        found = [self.paths[t] for t in self.tokens[lo:hi]]
+        return exact, (found[0] if len(found) == 1 else _Union(found))
+
+
+class _Union:
+    """
+    Read-only union of posting containers. Iterating just chains them;
+    the merged set is only built if something probes membership, which
+    the search avoids for the smallest (walked) set.
+    """
+
+    __slots__ = ("parts", "size", "_merged")
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.size = sum(map(len, parts))     # upper bound: parts may overlap
+        self._merged = None
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self.parts)
+
+    def __contains__(self, path):
+        if self._merged is None:
+            self._merged = set().union(*self.parts)
+        return path in self._merged
+
+
+class SearchIndex:
+    """
+    Per-field inverted index: folded word -> paths, with a sorted word
+    list per field for prefix lookups. add()/remove() keep it current one
+    track at a time, so metadata deltas never trigger a rebuild.
+    """
+
+    def __init__(self):
+        self._fields = {field: _FieldPostings() for field in FIELD_WEIGHTS}
+
+    @classmethod
+    def build(cls, tracks):
+        index = cls()
+        for postings in index._fields.values():
+            postings.bulk = True     # sort the word lists once at the end
+        for t in tracks:
+            index.add(t)
+        for postings in index._fields.values():
+            postings.tokens.sort()
+            postings.bulk = False
+        return index
+
+    def __len__(self):
+        return sum(len(p.tokens) for p in self._fields.values())
+
+    # ---------- updates ----------
+    def add(self, track):
+        for field, postings in self._fields.items():
+            value = getattr(track, field)
+            if value:
+                for token in tokenize(value):
+                    postings.add(token, track.path)
+
+    def remove(self, track):
+        for field, postings in self._fields.items():
+            value = getattr(track, field)
+            if value:
+                for token in tokenize(value):
+                    postings.remove(token, track.path)
+
+    # ---------- queries ----------
+    def _levels(self, word):
+        """[(weight, paths)] for word, best first; a track may appear at several levels."""
+        levels = []
+        for field, postings in self._fields.items():
+            exact, prefix = postings.matches(word)
+            weight = FIELD_WEIGHTS[field]
+            if exact:
+                levels.append((2 * weight, exact))
+            if prefix:
+                levels.append((weight, prefix))
+        levels.sort(key=lambda level: level[0], reverse=True)
+        return levels
+
+    def search(self, query, limit=200):
+        """
+        Paths of tracks where every query word is a whole word or prefix of
+        a word in one of the fields, best first. A track's score is the sum,
+        over the query words, of the best level each word hit.
+
+        The word with the fewest postings is walked and the others are only
+        probed for the paths it found, so a query costs about the size of
+        its postings however many words it has.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        per_word = []
+        for word in words:
+            levels = self._levels(word)
+            if not levels:
+                return []
+            per_word.append(levels)
+        per_word.sort(key=lambda levels: sum(len(paths) for _, paths in levels))
+
+        walked, *probed = per_word
+        scores = {}
+        for weight, paths in walked:
+            for path in paths:
+                # levels are best first: the first hit is the path's best
+                if path not in scores:
+                    scores[path] = weight
+        for levels in probed:
+            for path, score in list(scores.items()):
+                best = next((weight for weight, paths in levels if path in paths), None)
+                if best is None:
+                    del scores[path]
+                else:
+                    scores[path] = score + best
+            if not scores:
+                return []
+        return heapq.nlargest(limit, scores, key=scores.__getitem__)
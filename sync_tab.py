@@ -8,6 +8,8 @@
 )
 from PyQt5.QtCore import Qt, QTimer
 from config import ROAMING_DIR, LOCAL_DIR, ONEDRIVE_DATA_DIR
+from library_walker import list_audio_files
+from metadata_store import open_metadata_store, SQLiteMetadataStore
 
 from safe_print import safe_print
 
@@ -216,14 +218,12 @@ def _find_latest_backup(self, prefix):
 
     # --------------------------------------------------
     def _get_songs(self, path):
-        songs = []
-        if not os.path.exists(path):
-            return songs
-        for root, _, files in os.walk(path):
-            for f in files:
-                if f.lower().endswith(".mp3"):
-                    songs.append(os.path.relpath(os.path.join(root, f), path))
-        return songs
+        # unchanged folders are served from the walker's directory index;
+        # sync only carries MP3s, whatever else the library can play
+        return [
+            os.path.relpath(p, path) for p in list_audio_files(path)
+            if p.lower().endswith(".mp3")
+        ]
 
     # --------------------------------------------------
     def sync_playlists(self):
@@ -250,10 +250,24 @@ def backup_all_data(self):
 
         files_to_backup = {
             self.local_library_path: f"library_backup_{timestamp}.json",
-            self.local_metadata_path: f"metadata_backup_{timestamp}.json",
         }
 
         backed_up = []
+        # with the SQLite backend the JSON file is stale after migration
+        try:
+            store = open_metadata_store()
+            try:
+                if isinstance(store, SQLiteMetadataStore):
+                    dst = f"metadata_backup_{timestamp}.db"
+                    store.backup_to(os.path.join(backup_dir, dst))
+                    backed_up.append(dst)
+                else:
+                    files_to_backup[self.local_metadata_path] = f"metadata_backup_{timestamp}.json"
+            finally:
+                store.close()
+        except Exception as e:
+            safe_print(f"Metadata backup failed: {e}")
+
         for src, dst in files_to_backup.items():
             if os.path.exists(src):
                 shutil.copy2(src, os.path.join(backup_dir, dst))
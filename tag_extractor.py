@@ -1,14 +1,32 @@
 import os
 import json
 import shutil
+import base64
+import hashlib
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime
-from mutagen.easyid3 import EasyID3
 from mutagen.id3 import ID3
 from mutagen.mp3 import MP3
+from mutagen.flac import FLAC, Picture
+from mutagen.mp4 import MP4
+from mutagen.wave import WAVE
+import mutagen
 from PIL import Image
 from io import BytesIO
 
-from config import ROAMING_DIR, LOCAL_DIR, DEFAULT_MUSIC_DIR
+from config import (
+    ROAMING_DIR, LOCAL_DIR, DEFAULT_MUSIC_DIR, PLAYLISTS_FILE,
+    SCAN_WORKERS, SCAN_USE_PROCESSES, SCAN_PRUNE_UNCHANGED_DIRS, SCAN_FAST_MP3_READER,
+)
+from fast_tags import FastTagError, read_mp3_fast, open_counted
+from library_walker import walk_library, save_dir_index
+from scan_journal import ScanJournal
+from metadata_store import open_metadata_store, SQLiteMetadataStore
+from artwork_cache import (
+    atomic_save_jpeg, make_thumbnails, thumbnails_exist, remove_artwork,
+)
 
 
 # ----------------------------------------------------------
@@ -21,25 +39,49 @@
 os.makedirs(BACKUP_DIR, exist_ok=True)
 os.makedirs(ARTWORK_DIR, exist_ok=True)
 
+# full rescans and watcher updates both write the store; never overlap them
+SCAN_LOCK = threading.Lock()
+
 
 # ----------------------------------------------------------
-# Save embedded artwork
+# Save embedded artwork (content-addressed, deduplicated)
 # ----------------------------------------------------------
-def save_artwork(mp3_path, stem):
+def artwork_key(image_bytes):
+    """Stable cache key for an embedded image: SHA-1 of its raw bytes."""
+    return hashlib.sha1(image_bytes).hexdigest()
+
+
+def store_artwork_bytes(image_bytes):
+    """
+    Write embedded image bytes into the artwork cache as <sha1>.jpg, plus
+    its list/player thumbnails. Identical images are decoded and written
+    only once. Returns the path relative to LOCAL_DIR, or '' on failure.
+    """
+    key = artwork_key(image_bytes)
+    full_path = os.path.join(ARTWORK_DIR, f"{key}.jpg")
+    rel_path = os.path.relpath(full_path, LOCAL_DIR)
+
+    if os.path.exists(full_path) and thumbnails_exist(key):
+        return rel_path
+
+    try:
+        img = Image.open(BytesIO(image_bytes)).convert("RGB")
+        if not os.path.exists(full_path):
+            atomic_save_jpeg(img, full_path)
+        make_thumbnails(img, key)
+    except Exception:
+        return ""
+
+    return rel_path
+
+
+def save_artwork(mp3_path):
     """Extract and save embedded album art. Returns relative artwork path or ''. """
 
     try:
-        audio = ID3(mp3_path)
-        for key in audio.keys():
-            if key.startswith("APIC"):
-                artwork_data = audio[key].data
-                img = Image.open(BytesIO(artwork_data))
-                filename = f"{stem}.jpg"
-                full_path = os.path.join(ARTWORK_DIR, filename)
-                img.convert("RGB").save(full_path, "JPEG")
-
-                # store relative path (inside LOCAL_DIR)
-                return os.path.relpath(full_path, LOCAL_DIR)
+        picture = _id3_picture(ID3(mp3_path))
+        if picture:
+            return store_artwork_bytes(picture)
 
     except Exception:
         pass
@@ -47,53 +89,480 @@ def save_artwork(mp3_path, stem):
     return ""
 
 
+def is_legacy_artwork(art_rel):
+    """True for pre-dedup '<stem>.jpg' paths, which can collide between albums."""
+    if not art_rel:
+        return False
+    name = os.path.splitext(os.path.basename(art_rel))[0]
+    return len(name) != 40 or any(c not in "0123456789abcdef" for c in name)
+
+
+def remove_unreferenced_artwork(candidates, metadata):
+    """Delete cached artwork in candidates that no metadata entry still uses."""
+    in_use = {entry.get("artwork", "") for entry in metadata.values()}
+    for art_rel in candidates:
+        if art_rel and art_rel not in in_use:
+            remove_artwork(art_rel)
+
+
+def remove_unreferenced_waveforms(candidates, metadata):
+    """Delete cached waveform overviews in candidates that no metadata entry still uses."""
+    in_use = {entry.get("waveform", "") for entry in metadata.values()}
+    for rel_path in candidates:
+        if rel_path and rel_path not in in_use:
+            try:
+                os.remove(os.path.join(LOCAL_DIR, rel_path))
+            except OSError:
+                pass
+
+
 # ----------------------------------------------------------
-# Extract metadata for a single MP3
+# Per-format tag readers
+# Each takes an open binary file (or a path) and returns
+# (tags, picture_bytes, stream) where tags maps EasyID3-style
+# keys ("title", "albumartist", "tracknumber", ...) to one string and
+# stream holds the audio properties from stream_info().
 # ----------------------------------------------------------
-def extract_metadata(mp3_path):
-    """Return a dictionary of tags for one MP3 file."""
+def _first_values(mapping):
+    """{key: [v, ...]} -> {lowercase key: str(v)} keeping only the first value."""
+    out = {}
+    for key, values in mapping.items():
+        if isinstance(values, (list, tuple)):
+            if values:
+                out[key.lower()] = str(values[0])
+        else:
+            out[key.lower()] = str(values)
+    return out
+
+
+# EasyID3 key -> ID3 frame id
+ID3_TEXT_FRAMES = {
+    "title": "TIT2",
+    "albumartist": "TPE2",
+    "album": "TALB",
+    "organization": "TPUB",
+    "discnumber": "TPOS",
+    "tracknumber": "TRCK",
+    "date": "TDRC",
+    "genre": "TCON",
+    "composer": "TCOM",
+}
+
+
+def stream_info(audio, codec):
+    """Duration / bitrate / sample rate / channels / codec from a mutagen file."""
+    info = getattr(audio, "info", None)
+    if info is None:
+        return {}
+    return {
+        "duration": round(float(getattr(info, "length", 0) or 0), 3),
+        "bitrate": int(getattr(info, "bitrate", 0) or 0),
+        "sample_rate": int(getattr(info, "sample_rate", 0) or 0),
+        "channels": int(getattr(info, "channels", 0) or 0),
+        "codec": codec,
+    }
+
+
+def _id3_to_easy(id3):
+    """EasyID3-equivalent key mapping done in memory on a parsed ID3 tag."""
+    tags = {}
+    if id3 is None:
+        return tags
+    for key, frame_id in ID3_TEXT_FRAMES.items():
+        frame = id3.get(frame_id)
+        if frame is None:
+            continue
+        values = frame.genres if frame_id == "TCON" else frame.text
+        if values:
+            tags[key] = str(values[0])
+    return tags
+
+
+def _id3_picture(id3):
+    if id3 is None:
+        return None
+    for key in id3.keys():
+        if key.startswith("APIC"):
+            return id3[key].data
+    return None
 
+
+def _rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+
+def _read_mp3(source):
+    # bulk scans: header + first frame + ID3v1 tail only
+    if SCAN_FAST_MP3_READER and hasattr(source, "read"):
+        try:
+            return read_mp3_fast(source)
+        except (FastTagError, ValueError, IndexError, struct.error):
+            _rewind(source)
+
+    # one MP3() parse feeds text frames, pictures and stream info
     try:
-        tags = EasyID3(mp3_path)
+        audio = MP3(source)
     except Exception:
-        tags = {}
+        # no decodable MPEG frames: still read whatever tag is there
+        try:
+            _rewind(source)
+            id3 = ID3(source)
+        except Exception:
+            id3 = None
+        return _id3_to_easy(id3), _id3_picture(id3), {}
+    return _id3_to_easy(audio.tags), _id3_picture(audio.tags), stream_info(audio, "mp3")
+
+
+def _read_wav(source):
+    audio = WAVE(source)
+    return _id3_to_easy(audio.tags), _id3_picture(audio.tags), stream_info(audio, "pcm")
+
+
+# Vorbis comment aliases -> EasyID3 keys
+VORBIS_ALIASES = {
+    "album artist": "albumartist",
+    "label": "organization",
+    "publisher": "organization",
+    "totaldiscs": "disctotal",
+    "year": "date",
+}
+
+
+def _vorbis_tags(comments):
+    tags = {}
+    if comments is None:
+        return tags
+    for key, value in _first_values(dict(comments.as_dict())).items():
+        tags.setdefault(VORBIS_ALIASES.get(key, key), value)
+    return tags
+
+
+def _vorbis_picture(comments):
+    if comments is None:
+        return None
+    for b64 in comments.get("metadata_block_picture", []):
+        try:
+            return Picture(base64.b64decode(b64)).data
+        except Exception:
+            continue
+    return None
+
+
+def _read_flac(source):
+    audio = FLAC(source)
+    picture = audio.pictures[0].data if audio.pictures else _vorbis_picture(audio.tags)
+    return _vorbis_tags(audio.tags), picture, stream_info(audio, "flac")
+
+
+def _read_ogg(source):
+    # mutagen.File picks Vorbis / Opus / FLAC-in-Ogg from the header
+    audio = mutagen.File(source)
+    if audio is None:
+        return {}, None, {}
+    # OggVorbis -> "vorbis", OggOpus -> "opus", OggFLAC -> "flac"
+    codec = type(audio).__name__.lower().replace("ogg", "") or "ogg"
+    return _vorbis_tags(audio.tags), _vorbis_picture(audio.tags), stream_info(audio, codec)
+
+
+# MP4 atom -> EasyID3 key
+MP4_TEXT_ATOMS = {
+    "\xa9nam": "title",
+    "aART": "albumartist",
+    "\xa9alb": "album",
+    "\xa9day": "date",
+    "\xa9gen": "genre",
+    "\xa9wrt": "composer",
+    "----:com.apple.iTunes:LABEL": "organization",
+}
+
+
+def _read_mp4(source):
+    audio = MP4(source)
+    atoms = audio.tags or {}
+    tags = {}
+    for atom, key in MP4_TEXT_ATOMS.items():
+        values = atoms.get(atom)
+        if values:
+            value = values[0]
+            tags[key] = value.decode("utf-8", "ignore") if isinstance(value, bytes) else str(value)
+
+    # trkn / disk are (number, total) pairs
+    for atom, key in (("trkn", "tracknumber"), ("disk", "discnumber")):
+        pairs = atoms.get(atom)
+        if pairs:
+            num, total = pairs[0]
+            tags[key] = f"{num}/{total}" if total else str(num)
+            if atom == "disk" and total:
+                tags["disctotal"] = str(total)
+
+    covers = atoms.get("covr")
+    picture = bytes(covers[0]) if covers else None
+    # info.codec is e.g. "mp4a.40.2" (AAC-LC) or "alac"
+    return tags, picture, stream_info(audio, getattr(audio.info, "codec", "") or "mp4")
+
+
+TAG_READERS = {
+    ".mp3": _read_mp3,
+    ".flac": _read_flac,
+    ".ogg": _read_ogg,
+    ".m4a": _read_mp4,
+    ".wav": _read_wav,
+}
+
+
+# ----------------------------------------------------------
+# Extract metadata for a single audio file (any supported format)
+# ----------------------------------------------------------
+def extract_metadata(path):
+    """Return a dictionary of tags for one audio file."""
+    return _extract_counted(path)[0]
 
-    stem = os.path.splitext(os.path.basename(mp3_path))[0]
+
+def _extract_counted(path):
+    """extract_metadata() plus the number of bytes read from the file."""
+
+    ext = os.path.splitext(path)[1].lower()
+    reader = TAG_READERS.get(ext, _read_mp3)
+    tags, picture, stream = {}, None, {}
+    cid, bytes_read = "", 0
+    try:
+        f, raw = open_counted(path)
+    except OSError:
+        f = None
+    if f is not None:
+        with f:
+            try:
+                tags, picture, stream = reader(f)
+            except Exception:
+                pass
+            cid = content_id(path, fileobj=f)
+            bytes_read = raw.bytes_read
+
+    stem = os.path.splitext(os.path.basename(path))[0]
 
     metadata = {
-        "title": tags.get("title", [stem])[0],
-        "album_artist": tags.get("albumartist", [""])[0],
-        "album": tags.get("album", [""])[0],
-        "publisher": tags.get("organization", [""])[0],
-        "disc_number": tags.get("discnumber", [""])[0],
-        "track_number": tags.get("tracknumber", [""])[0],
-        "total_discs": tags.get("disctotal", [""])[0] if "disctotal" in tags else "",
-        "year": tags.get("date", [""])[0],
-        "genre": tags.get("genre", [""])[0],
-        "composer": tags.get("composer", [""])[0],
+        "title": tags.get("title", stem),
+        "album_artist": tags.get("albumartist", ""),
+        "album": tags.get("album", ""),
+        "publisher": tags.get("organization", ""),
+        "disc_number": tags.get("discnumber", ""),
+        "track_number": tags.get("tracknumber", ""),
+        "total_discs": tags.get("disctotal", ""),
+        "year": tags.get("date", ""),
+        "genre": tags.get("genre", ""),
+        "composer": tags.get("composer", ""),
         "artwork": "",
+        # stream properties, so playback never has to re-parse the file
+        "duration": 0,
+        "bitrate": 0,
+        "sample_rate": 0,
+        "channels": 0,
+        "codec": "",
     }
+    metadata.update(stream)
+    metadata["content_id"] = cid
 
-    rel_art = save_artwork(mp3_path, stem)
+    rel_art = store_artwork_bytes(picture) if picture else ""
     if rel_art:
         metadata["artwork"] = rel_art
 
-    return metadata
+    return metadata, bytes_read
 
 
 # ----------------------------------------------------------
-# Make backup of music_metadata.json
+# Stat fingerprint (detects retagged / replaced files)
 # ----------------------------------------------------------
-def backup_metadata_file():
-    if not os.path.exists(OUTPUT_JSON):
-        return
+def file_fingerprint(path):
+    """Return {"file_size", "mtime_ns"} for path, or None if it can't be stat'ed."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return {"file_size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def needs_refresh(entry, fingerprint):
+    """
+    True if an existing entry must be re-extracted: the file changed on
+    disk, or the entry predates a schema addition (hashed artwork,
+    stream properties) and would otherwise never be upgraded.
+    """
+    return (
+        fingerprint_changed(entry, fingerprint)
+        or is_legacy_artwork(entry.get("artwork", ""))
+        or "codec" not in entry
+    )
+
+
+def fingerprint_changed(entry, fingerprint):
+    """True if a stored metadata entry no longer matches the file on disk."""
+    if fingerprint is None:
+        return False
+    return (
+        entry.get("file_size") != fingerprint["file_size"]
+        or entry.get("mtime_ns") != fingerprint["mtime_ns"]
+    )
+
+
+# ----------------------------------------------------------
+# Content fingerprint (recognises moved / renamed files)
+# ----------------------------------------------------------
+CONTENT_SAMPLE_BYTES = 64 * 1024
+
 
+def content_id(path, size=None, fileobj=None):
+    """
+    "<size>:<hash>" of a fixed sample from the middle of the file, which
+    is audio data for any real track. Survives moves and renames.
+    fileobj reuses an already open handle. Returns '' if the file can't
+    be read.
+    """
+    try:
+        if size is None:
+            size = os.path.getsize(path)
+        offset = max(0, size // 2 - CONTENT_SAMPLE_BYTES // 2)
+        if fileobj is not None:
+            fileobj.seek(offset)
+            sample = fileobj.read(CONTENT_SAMPLE_BYTES)
+        else:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                sample = f.read(CONTENT_SAMPLE_BYTES)
+    except (OSError, ValueError):
+        return ""
+    return f"{size}:{hashlib.blake2b(sample, digest_size=12).hexdigest()}"
+
+
+def detect_moves(metadata, new_paths, removed_paths, fingerprints=None):
+    """
+    Match new paths to vanished entries by content_id.
+    Returns {old_path: new_path}. Only files whose size matches a
+    vanished entry are sampled, so unrelated new files cost nothing.
+    """
+    by_id = {}
+    sizes = set()
+    for old in removed_paths:
+        cid = metadata.get(old, {}).get("content_id")
+        if cid:
+            by_id.setdefault(cid, old)
+            sizes.add(int(cid.split(":", 1)[0]))
+    if not by_id:
+        return {}
+
+    moves = {}
+    for new in sorted(new_paths):
+        fp = (fingerprints or {}).get(new) or file_fingerprint(new)
+        if fp is None or fp["file_size"] not in sizes:
+            continue
+        old = by_id.pop(content_id(new, fp["file_size"]), None)
+        if old:
+            moves[old] = new
+    return moves
+
+
+def rewrite_playlist_paths(moves, playlists_file=PLAYLISTS_FILE):
+    """Point saved playlists at moved files. Returns number of paths rewritten."""
+    if not moves or not os.path.exists(playlists_file):
+        return 0
+    try:
+        with open(playlists_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return 0
+
+    playlists = data["playlists"] if isinstance(data, dict) and "playlists" in data else data
+    if not isinstance(playlists, dict):
+        return 0
+
+    rewritten = 0
+    for name, songs in playlists.items():
+        if not isinstance(songs, list):
+            continue
+        for i, song in enumerate(songs):
+            if song in moves:
+                songs[i] = moves[song]
+                rewritten += 1
+
+    if rewritten:
+        tmp_path = f"{playlists_file}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, playlists_file)
+    return rewritten
+
+
+def _apply_moves(metadata, moves, fingerprints=None):
+    """Re-key moved entries in place (metadata and artwork are reused as-is)."""
+    for old, new in moves.items():
+        entry = metadata.pop(old)
+        fp = (fingerprints or {}).get(new) or file_fingerprint(new)
+        if fp:
+            entry.update(fp)
+        metadata[new] = entry
+
+
+# ----------------------------------------------------------
+# Extract many files, optionally across a worker pool
+# ----------------------------------------------------------
+def extract_many(paths, workers=None, use_processes=None, on_result=None, cancel=None):
+    """
+    Run extract_metadata() over paths and return results in the same order.
+    Order is preserved so callers can merge deterministically.
+
+    on_result(path, entry, bytes_read) is called after each file; if the cancel
+    Event is set, extraction stops early and only the finished prefix of
+    results is returned (zip() with paths to merge it).
+    """
+    if workers is None:
+        workers = SCAN_WORKERS
+    if use_processes is None:
+        use_processes = SCAN_USE_PROCESSES
+
+    results = []
+
+    if workers <= 1 or len(paths) < 2:
+        for p in paths:
+            if cancel is not None and cancel.is_set():
+                break
+            entry, bytes_read = _extract_counted(p)
+            results.append(entry)
+            if on_result:
+                on_result(p, entry, bytes_read)
+        return results
+
+    pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    # big chunks keep process-pool pickling overhead low; threads ignore it
+    chunksize = max(1, len(paths) // (workers * 8))
+
+    pool = pool_cls(max_workers=workers)
+    try:
+        for p, (entry, bytes_read) in zip(paths, pool.map(_extract_counted, paths, chunksize=chunksize)):
+            results.append(entry)
+            if on_result:
+                on_result(p, entry, bytes_read)
+            if cancel is not None and cancel.is_set():
+                break
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    return results
+
+
+# ----------------------------------------------------------
+# Make backup of music_metadata.json
+# ----------------------------------------------------------
+def backup_metadata_file(store=None):
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    backup_name = f"music_metadata_{timestamp}.json"
-    backup_path = os.path.join(BACKUP_DIR, backup_name)
 
     try:
-        shutil.copy2(OUTPUT_JSON, backup_path)
+        if isinstance(store, SQLiteMetadataStore):
+            backup_path = os.path.join(BACKUP_DIR, f"music_metadata_{timestamp}.db")
+            store.backup_to(backup_path)
+        elif os.path.exists(OUTPUT_JSON):
+            backup_path = os.path.join(BACKUP_DIR, f"music_metadata_{timestamp}.json")
+            shutil.copy2(OUTPUT_JSON, backup_path)
+        else:
+            return
     except Exception:
         return
 
@@ -115,53 +584,237 @@ def backup_metadata_file():
 # PUBLIC FUNCTION:
 # Rebuild metadata library (called by LibraryTab)
 # ----------------------------------------------------------
-def rebuild_music_metadata():
-    music_dir = DEFAULT_MUSIC_DIR
-
-    # Load existing metadata
-    if os.path.exists(OUTPUT_JSON):
+def rebuild_music_metadata(workers=None, use_processes=None, progress=None, cancel=None,
+                           music_dir=None, full=None):
+    """
+    Rescan music_dir (default DEFAULT_MUSIC_DIR) and update the metadata store.
+    workers / use_processes override SCAN_WORKERS / SCAN_USE_PROCESSES.
+
+    progress(stats) receives {"seen", "extracted", "pending", "removed",
+    "bytes_read", "current"} while the scan runs. Setting the cancel Event stops the
+    scan; whatever was extracted so far is still committed, and the
+    result carries "cancelled": True.
+
+    full=True lists every folder even if its mtime is unchanged
+    (default: not SCAN_PRUNE_UNCHANGED_DIRS).
+
+    Extracted entries are checkpointed to a ScanJournal as the scan runs;
+    if a previous scan of music_dir died before committing, its journaled
+    entries are reused for files that haven't changed since.
+    """
+    music_dir = music_dir or DEFAULT_MUSIC_DIR
+    if full is None:
+        full = not SCAN_PRUNE_UNCHANGED_DIRS
+
+    with SCAN_LOCK:
+        store = open_metadata_store()
         try:
-            with open(OUTPUT_JSON, "r", encoding="utf-8") as f:
-                metadata = json.load(f)
-        except Exception:
-            metadata = {}
-    else:
-        metadata = {}
+            return _rebuild(store, music_dir, workers, use_processes, progress, cancel, full)
+        finally:
+            store.close()
 
-    backup_metadata_file()
 
-    found = set()
-    new_count = 0
+def _rebuild(store, music_dir, workers, use_processes, progress=None, cancel=None, full=False):
+    stats = {"seen": 0, "extracted": 0, "pending": 0, "removed": 0, "bytes_read": 0, "current": ""}
 
-    for root, _, files in os.walk(music_dir):
-        for f in files:
-            if f.lower().endswith(".mp3"):
-                full_path = os.path.join(root, f)
-                found.add(full_path)
+    def report(current=""):
+        if progress:
+            stats["current"] = current
+            progress(dict(stats))
 
-                if full_path not in metadata:
-                    metadata[full_path] = extract_metadata(full_path)
-                    new_count += 1
+    def cancelled():
+        return cancel is not None and cancel.is_set()
 
-    # files removed from library
-    removed = set(metadata.keys()) - found
+    # Load existing metadata
+    metadata = store.load_all()
+    if not isinstance(metadata, dict):
+        metadata = {}
+
+    backup_metadata_file(store)
+
+    def on_dir(d, count):
+        stats["seen"] += count
+        report(d)
+
+    # one walk covers every supported format; unchanged folders are not
+    # listed again, only their known files are stat'ed
+    walk = walk_library(music_dir, full=full, cancel=cancel, on_dir=on_dir)
+    walk_complete = walk["complete"]
+    found = set(walk["files"])
+    pending = {}
+
+    for full_path, fp in walk["files"].items():
+        if full_path not in metadata or needs_refresh(metadata[full_path], fp):
+            pending[full_path] = fp
+
+    # moved / renamed files: re-key the old entry instead of re-extracting
+    moves = {}
+    if walk_complete:
+        vanished = set(metadata) - found
+        new_paths = [p for p in pending if p not in metadata]
+        moves = detect_moves(metadata, new_paths, vanished, pending)
+        _apply_moves(metadata, moves, pending)
+        for new in moves.values():
+            pending.pop(new, None)
+
+    # entries from before content ids existed: backfill without re-extracting
+    backfilled = []
+    for full_path in found:
+        entry = metadata.get(full_path)
+        if entry is not None and full_path not in pending and "content_id" not in entry:
+            entry["content_id"] = content_id(full_path)
+            backfilled.append(full_path)
+
+    # an interrupted earlier scan: reuse what it extracted if still current
+    journal = ScanJournal(music_dir)
+    resumed = {}
+    if walk_complete:
+        for full_path, entry in journal.load().items():
+            if full_path in pending and not fingerprint_changed(
+                entry, pending[full_path] or file_fingerprint(full_path)
+            ):
+                resumed[full_path] = entry
+
+    stats["seen"] = len(found)
+    stats["pending"] = len(pending)
+    stats["extracted"] = len(resumed)
+    report()
+
+    # artwork / waveform overviews that may become orphaned by this scan
+    stale_art, stale_waves = set(), set()
+
+    def on_result(path, entry, bytes_read):
+        stats["extracted"] += 1
+        stats["bytes_read"] += bytes_read
+        journal.append(path, dict(entry, **(pending[path] or file_fingerprint(path) or {})))
+        report(path)
+
+    # extract in parallel, merge in sorted path order
+    paths = sorted(p for p in pending if p not in resumed) if walk_complete else []
+    if paths:
+        journal.open()
+    try:
+        results = extract_many(paths, workers, use_processes, on_result, cancel)
+    finally:
+        journal.close()
+    was_cancelled = not walk_complete or len(results) < len(paths)
+    extracted_count = len(results)
+    paths = sorted(resumed) + paths[:len(results)]
+    results = [resumed[p] for p in sorted(resumed)] + results
+    new_count = 0
+    for full_path, entry in zip(paths, results):
+        if pending[full_path]:
+            entry.update(pending[full_path])
+        if full_path in metadata:
+            stale_art.add(metadata[full_path].get("artwork", ""))
+            stale_waves.add(metadata[full_path].get("waveform", ""))
+        else:
+            new_count += 1
+        metadata[full_path] = entry
+    updated_count = len(paths) - new_count
+
+    # files removed from library (only trustworthy after a full walk)
+    removed = set(metadata.keys()) - found if walk_complete else set()
     for dead in removed:
-        art_rel = metadata[dead].get("artwork", "")
-        if art_rel:
-            art_abs = os.path.join(LOCAL_DIR, art_rel)
-            if os.path.exists(art_abs):
-                try:
-                    os.remove(art_abs)
-                except Exception:
-                    pass
+        stale_art.add(metadata[dead].get("artwork", ""))
+        stale_waves.add(metadata[dead].get("waveform", ""))
         del metadata[dead]
-
-    # Save updated file
-    with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=4, ensure_ascii=False)
+    stats["removed"] = len(removed)
+    report()
+
+    # artwork / overviews are shared between tracks: only delete files nobody references
+    remove_unreferenced_artwork(stale_art, metadata)
+    remove_unreferenced_waveforms(stale_waves, metadata)
+
+    # Save: SQLite touches only changed rows, JSON is rewritten
+    store.commit(
+        metadata,
+        changed=paths + list(moves.values()) + backfilled,
+        removed=removed | set(moves),
+    )
+    # everything journaled is in the store now
+    if walk_complete:
+        journal.discard()
+    rewrite_playlist_paths(moves)
+
+    # folder mtimes are only trustworthy once every change they cover is saved
+    if not was_cancelled:
+        try:
+            save_dir_index(music_dir, walk["index"])
+        except Exception:
+            pass
 
     return {
         "total": len(metadata),
         "new": new_count,
+        "updated": updated_count,
         "removed": len(removed),
+        "moved": len(moves),
+        "moves": moves,
+        "resumed": len(resumed),
+        "cancelled": was_cancelled,
+        "dirs_total": walk["dirs_total"],
+        "dirs_listed": walk["dirs_listed"],
+        # I/O cost of extraction, to compare tag reader settings
+        "bytes_read": stats["bytes_read"],
+        "bytes_per_file": stats["bytes_read"] // extracted_count if extracted_count else 0,
     }
+
+
+# ----------------------------------------------------------
+# PUBLIC FUNCTION:
+# Apply a batch of file changes (called by LibraryWatcher)
+# ----------------------------------------------------------
+def apply_file_changes(changed, removed, workers=None, use_processes=None):
+    """
+    Re-extract the changed paths and drop the removed ones without
+    walking the library. Moves (a removed path whose content reappears
+    under a changed path) are re-keyed instead of re-extracted.
+    Returns the delta that was committed:
+    {"upserts": {path: entry}, "removed": [path, ...], "moved": {old: new}}.
+    """
+    with SCAN_LOCK:
+        store = open_metadata_store()
+        try:
+            metadata = store.load_all()
+            if not isinstance(metadata, dict):
+                metadata = {}
+
+            paths = sorted(p for p in set(changed) if os.path.exists(p))
+            moves = detect_moves(
+                metadata,
+                [p for p in paths if p not in metadata],
+                [p for p in set(removed) if p in metadata and p not in paths],
+            )
+            _apply_moves(metadata, moves)
+            upserts = {new: metadata[new] for new in moves.values()}
+            paths = [p for p in paths if p not in upserts]
+
+            results = extract_many(paths, workers, use_processes)
+
+            stale_art, stale_waves = set(), set()
+            for full_path, entry in zip(paths, results):
+                fp = file_fingerprint(full_path)
+                if fp:
+                    entry.update(fp)
+                if full_path in metadata:
+                    stale_art.add(metadata[full_path].get("artwork", ""))
+                    stale_waves.add(metadata[full_path].get("waveform", ""))
+                metadata[full_path] = entry
+                upserts[full_path] = entry
+
+            dead = sorted(p for p in set(removed) if p in metadata and p not in upserts)
+            for full_path in dead:
+                stale_art.add(metadata[full_path].get("artwork", ""))
+                stale_waves.add(metadata[full_path].get("waveform", ""))
+                del metadata[full_path]
+
+            if upserts or dead or moves:
+                store.commit(metadata, changed=list(upserts), removed=dead + sorted(moves))
+                remove_unreferenced_artwork(stale_art, metadata)
+                remove_unreferenced_waveforms(stale_waves, metadata)
+            rewrite_playlist_paths(moves)
+        finally:
+            store.close()
+
+    return {"upserts": upserts, "removed": dead + sorted(moves), "moved": moves}
@@ -0,0 +1,127 @@
+# thumbnail_service.py — background artwork decoding + byte-bounded pixmap LRU
+import itertools
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap, QPainter
+
+from artwork_cache import best_artwork_path
+from config import THUMBNAIL_CACHE_MB, THUMBNAIL_THREADS
+
+
+# "no usable artwork" results are cached too, at a nominal cost
+MISSING_COST = 64
+
+
+def _fit(img, width, height):
+    """img scaled into width x height, centred on a transparent canvas of exactly that size."""
+    scaled = img.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    canvas = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+    canvas.fill(Qt.transparent)
+    painter = QPainter(canvas)
+    painter.drawImage((width - scaled.width()) // 2, (height - scaled.height()) // 2, scaled)
+    painter.end()
+    return canvas
+
+
+class _Signals(QObject):
+    loaded = pyqtSignal(object, object)   # key, scaled QImage or None
+
+
+class _LoadTask(QRunnable):
+    """Decode + scale one artwork file. QImage is safe off the GUI thread; QPixmap isn't."""
+
+    def __init__(self, key, signals):
+        super().__init__()
+        self.key = key
+        self.signals = signals
+
+    def run(self):
+        art_path, width, height = self.key
+        image = None
+        try:
+            full_path = best_artwork_path(art_path, width, height)
+            if full_path:
+                img = QImage(full_path)
+                if not img.isNull():
+                    image = _fit(img, width, height)
+        except Exception:
+            image = None
+        self.signals.loaded.emit(self.key, image)
+
+
+class ThumbnailService(QObject):
+    """
+    Shared artwork thumbnails for the GUI.
+
+    pixmap(art_path, size) answers from an LRU of scaled QPixmaps, or
+    returns None and queues the decode on a worker thread;
+    thumbnail_ready(art_path) fires once it is cached. The LRU is bounded
+    by pixmap bytes (THUMBNAIL_CACHE_MB), not by entry count. The newest
+    requests are decoded first, so the rows on screen win over ones
+    scrolled past.
+    """
+
+    thumbnail_ready = pyqtSignal(str)
+
+    def __init__(self, max_bytes=None, threads=None, parent=None):
+        super().__init__(parent)
+        self.max_bytes = max_bytes if max_bytes is not None else THUMBNAIL_CACHE_MB * 1024 * 1024
+        self._cache = OrderedDict()   # (art_path, w, h) -> QPixmap or None
+        self._bytes = 0
+        self._pending = set()
+        self._priority = itertools.count()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(threads or THUMBNAIL_THREADS)
+        self._signals = _Signals(self)
+        self._signals.loaded.connect(self._on_loaded)
+
+    @property
+    def cached_bytes(self):
+        return self._bytes
+
+    def pixmap(self, art_path, size):
+        """Cached thumbnail of art_path scaled into size, or None (no art / still loading)."""
+        if not art_path:
+            return None
+        key = (art_path, size.width(), size.height())
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        if key not in self._pending:
+            self._pending.add(key)
+            self._pool.start(_LoadTask(key, self._signals), next(self._priority))
+        return None
+
+    def wait_for_done(self, msecs=-1):
+        return self._pool.waitForDone(msecs)
+
+    @staticmethod
+    def _cost(pixmap):
+        if pixmap is None:
+            return MISSING_COST
+        return pixmap.width() * pixmap.height() * max(1, pixmap.depth() // 8)
+
+    def _on_loaded(self, key, image):
+        self._pending.discard(key)
+        pixmap = QPixmap.fromImage(image) if image is not None else None
+        old = self._cache.pop(key, False)
+        if old is not False:
+            self._bytes -= self._cost(old)
+        self._cache[key] = pixmap
+        self._bytes += self._cost(pixmap)
+        while self._bytes > self.max_bytes and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False)
+            self._bytes -= self._cost(evicted)
+        self.thumbnail_ready.emit(key[0])
+
+
+_shared = None
+
+
+def shared_thumbnail_service():
+    """The app-wide ThumbnailService (created on first use, GUI thread)."""
+    global _shared
+    if _shared is None:
+        _shared = ThumbnailService()
+    return _shared
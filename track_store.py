@@ -0,0 +1,437 @@
+# track_store.py — compact, shared in-memory track table
+import re
+import sys
+import bisect
+import locale
+from collections import namedtuple
+from functools import lru_cache
+
+from metadata_store import open_metadata_store
+from search_index import SearchIndex, fold
+
+
+UNKNOWN_ARTIST = "Unknown Artist"
+UNKNOWN_ALBUM = "Unknown Album"
+
+# Canonical entry keys kept as fields (anything else goes to Track.extra).
+# Repeated values (names, numbers like "3/12", codecs, ...) are interned so
+# every track of an album shares one string object.
+TEXT_FIELDS = (
+    "title", "album_artist", "album", "publisher", "disc_number", "track_number",
+    "total_discs", "year", "genre", "composer", "artwork", "codec",
+    "content_id", "waveform", "loudness_key",
+)
+NUMBER_FIELDS = (
+    "duration", "bitrate", "sample_rate", "channels", "file_size", "mtime_ns",
+    "loudness", "peak", "loudness_blocks", "album_loudness",
+)
+INTERNED_FIELDS = frozenset({
+    "album_artist", "album", "publisher", "disc_number", "track_number",
+    "total_discs", "year", "genre", "composer", "artwork", "codec",
+})
+POOLED_NUMBERS = frozenset({"bitrate", "sample_rate", "channels", "album_loudness"})
+
+ENTRY_FIELDS = TEXT_FIELDS + NUMBER_FIELDS
+_ENTRY_KEYS = frozenset(ENTRY_FIELDS)
+_SHARED = [i for i, k in enumerate(ENTRY_FIELDS) if k in INTERNED_FIELDS or k in POOLED_NUMBERS]
+
+# Secondary browse indexes (Genre → Artist → Album, Decade → Year → Album,
+# Composer → Work), kept as facet -> value -> {album_id: matching tracks}.
+BROWSE_FACETS = ("genre", "decade", "year", "composer")
+_YEAR = re.compile(r"\d{4}")
+
+
+@lru_cache(maxsize=4096)
+def _year_and_decade(text):
+    """("1994", "1990s") for a date tag like "1994-03-01", or (None, None)."""
+    m = _YEAR.search(text)
+    if not m:
+        return None, None
+    year = m.group(0)
+    return sys.intern(year), sys.intern(f"{year[:3]}0s")
+
+
+def _facet_values(track):
+    """track's values for BROWSE_FACETS, in that order (None where it has none)."""
+    year, decade = _year_and_decade(track.year) if track.year else (None, None)
+    genre, composer = track.genre, track.composer
+    return (
+        genre and genre.strip() or None,
+        decade,
+        year,
+        composer and composer.strip() or None,
+    )
+
+
+# ---------- sort keys ----------
+_ARTICLE = re.compile(r"(the|a|an)\s+(?=\S)", re.IGNORECASE)
+_NUMBER = re.compile(r"\s*(\d+)")
+
+
+def name_sort_key(name):
+    """
+    Collation key for artist/album/genre/... names: leading "The "/"A "/"An "
+    ignored, accents and case folded, then ordered by the LC_COLLATE locale.
+    The name itself breaks ties so distinct names never compare equal.
+    """
+    base = _ARTICLE.sub("", name, count=1) if _ARTICLE.match(name) else name
+    return locale.strxfrm(fold(base)), name
+
+
+@lru_cache(maxsize=4096)
+def _leading_number(text):
+    """3 for "3", "03" or "3/12"; None if text doesn't start with a number."""
+    m = _NUMBER.match(text)
+    return int(m.group(1)) if m else None
+
+
+def track_sort_key(track):
+    """Album order: disc, then track number ("3/12" -> 3), then title; unnumbered tracks last."""
+    disc = _leading_number(track.disc_number) if track.disc_number else None
+    number = _leading_number(track.track_number) if track.track_number else None
+    return (
+        1 if disc is None else disc,
+        sys.maxsize if number is None else number,
+        (track.title or "").casefold(),
+        track.path,
+    )
+
+
+def facet_value(facet, track):
+    """The value track is filed under for a browse facet, or None."""
+    return _facet_values(track)[BROWSE_FACETS.index(facet)]
+
+
+class Track(namedtuple("Track", ("path", "album_id", "extra") + ENTRY_FIELDS)):
+    """
+    One library track: a tuple with named fields (track.title, track.album),
+    so it costs one pointer per field. It also reads like the metadata dict
+    it came from (track.get("album"), track["title"], "genre" in track) so
+    code that took entry dicts keeps working. Missing fields are None.
+    """
+
+    __slots__ = ()
+    _index = {name: i for i, name in enumerate(("path", "album_id", "extra") + ENTRY_FIELDS)}
+
+    def get(self, key, default=None):
+        i = Track._index.get(key)
+        if i is not None:
+            value = tuple.__getitem__(self, i)
+        elif self.extra:
+            value = self.extra.get(key)
+        else:
+            value = None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def items(self):
+        for key, value in zip(ENTRY_FIELDS, tuple.__getitem__(self, slice(3, None))):
+            if value is not None:
+                yield key, value
+        if self.extra:
+            yield from self.extra.items()
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+class TrackTable:
+    """
+    Every track in the library, shared by the Player and Library tabs.
+
+    Tracks are Track records keyed by path. Albums get integer ids and
+    are grouped as album_id -> [Track]; artists map to
+    {album: album_id}, and each browse facet (genre, decade, year,
+    composer) maps its values to the albums that have such a track.
+    Album track lists are kept in disc/track order, and name lists come
+    out presorted by collation keys computed once per distinct name.
+    Deltas from the scanner / watcher / analysis are applied with
+    apply_delta(); it is idempotent, so every tab may forward the same
+    delta. The full-text SearchIndex is built by build_search_index()
+    (or the first search()) and then kept in step by every add/remove.
+    """
+
+    def __init__(self):
+        self._clear()
+
+    def _clear(self):
+        self._tracks = {}
+        self._album_ids = {}          # (artist, album) -> id
+        self._album_keys = []         # id -> (artist, album)
+        self._album_tracks = {}       # id -> [Track]
+        self._album_art = {}          # id -> artwork of the first track that had one
+        self._artists = {}            # artist -> {album: id}
+        self._facets = {facet: {} for facet in BROWSE_FACETS}
+        # collation keys, computed once per distinct name as it first appears
+        self._name_keys = {}          # name -> name_sort_key(name)
+        self._orders = {}             # cached browse lists + facet art; cleared when their members change
+        self._bulk = False            # replace(): sort album track lists once at the end
+        # per-field value pools: one object for every repeat of a value
+        self._shared = {i: {} for i in _SHARED}
+        self._search = None           # SearchIndex, see build_search_index()
+
+    # ---------- loading ----------
+    @classmethod
+    def load(cls, store=None):
+        table = cls()
+        table.reload(store)
+        return table
+
+    def reload(self, store=None):
+        """Replace everything with the contents of the metadata store."""
+        own_store = store is None
+        store = store or open_metadata_store()
+        try:
+            data = store.load_all()
+        finally:
+            if own_store:
+                store.close()
+        self.replace(data if isinstance(data, dict) else {})
+
+    def replace(self, metadata):
+        self._clear()
+        self._bulk = True
+        try:
+            for path, entry in metadata.items():
+                self._add(path, entry)
+        finally:
+            self._bulk = False
+        for tracks in self._album_tracks.values():
+            tracks.sort(key=track_sort_key)
+
+    def adopt(self, other):
+        """Take over other's contents in place (e.g. a table loaded on a worker thread)."""
+        self.__dict__.update(other.__dict__)
+        other._clear()
+
+    # ---------- building records ----------
+    def _make_track(self, path, album_id, entry):
+        values = [entry.get(key) for key in ENTRY_FIELDS]
+        shared = self._shared
+        for i in _SHARED:
+            value = values[i]
+            if value is not None:
+                values[i] = shared[i].setdefault(value, value)
+        extra = None
+        if not _ENTRY_KEYS.issuperset(entry):
+            extra = {k: v for k, v in entry.items() if k not in _ENTRY_KEYS}
+        return tuple.__new__(Track, (path, album_id, extra, *values))
+
+    def _add(self, path, entry):
+        artist = entry.get("album_artist") or UNKNOWN_ARTIST
+        album = entry.get("album") or UNKNOWN_ALBUM
+        album_id = self._album_ids.get((artist, album))
+        if album_id is None:
+            artist, album = sys.intern(artist), sys.intern(album)
+            album_id = len(self._album_keys)
+            self._album_ids[(artist, album)] = album_id
+            self._album_keys.append((artist, album))
+            self._album_tracks[album_id] = []
+            self._artists.setdefault(artist, {})[album] = album_id
+            self._name_key(artist)
+            self._name_key(album)
+            self._orders.clear()
+        t = self._make_track(path, album_id, entry)
+        if self._bulk:
+            self._album_tracks[album_id].append(t)
+        else:
+            bisect.insort(self._album_tracks[album_id], t, key=track_sort_key)
+        if t.artwork and not self._album_art.get(album_id):
+            self._album_art[album_id] = t.artwork
+            self._forget_facet_art()
+        self._tracks[path] = t
+        for facet, value in zip(self._facets, _facet_values(t)):
+            if value:
+                albums = self._facets[facet].get(value)
+                if albums is None:
+                    albums = self._facets[facet][value] = {}
+                    self._name_key(value)
+                    self._orders.clear()
+                if album_id not in albums:
+                    self._orders.pop(("facet_art", facet, value), None)
+                albums[album_id] = albums.get(album_id, 0) + 1
+        if self._search is not None:
+            self._search.add(t)
+        return t
+
+    def _remove(self, path):
+        t = self._tracks.pop(path, None)
+        if t is None:
+            return
+        if self._search is not None:
+            self._search.remove(t)
+        for facet, value in zip(self._facets, _facet_values(t)):
+            index = self._facets[facet]
+            albums = index.get(value)
+            if albums and t.album_id in albums:
+                albums[t.album_id] -= 1
+                if not albums[t.album_id]:
+                    del albums[t.album_id]
+                    self._orders.pop(("facet_art", facet, value), None)
+                    if not albums:
+                        del index[value]
+                        self._orders.clear()
+        tracks = self._album_tracks.get(t.album_id, [])
+        tracks[:] = [s for s in tracks if s.path != path]
+        if not tracks:
+            artist, album = self._album_keys[t.album_id]
+            # ids are never reused; the slot in _album_keys just goes stale
+            del self._album_tracks[t.album_id]
+            del self._album_ids[(artist, album)]
+            self._album_art.pop(t.album_id, None)
+            albums = self._artists.get(artist, {})
+            albums.pop(album, None)
+            if not albums:
+                self._artists.pop(artist, None)
+            self._orders.clear()
+        elif self._album_art.get(t.album_id) == t.artwork:
+            art = next((s.artwork for s in tracks if s.artwork), "")
+            if art != t.artwork:
+                self._album_art[t.album_id] = art
+                self._forget_facet_art()
+
+    # ---------- updates ----------
+    def apply_delta(self, delta):
+        """Apply {"upserts": {path: entry}, "removed": [...], "moved": {old: new}}."""
+        for path in delta.get("removed", []):
+            self._remove(path)
+        for path, entry in delta.get("upserts", {}).items():
+            self._remove(path)
+            self._add(path, entry.to_dict() if isinstance(entry, Track) else entry)
+        self.move(delta.get("moved", {}))
+
+    def move(self, moves):
+        """Re-key moved files (old path -> new path) without touching their tags."""
+        for old, new in moves.items():
+            t = self._tracks.get(old)
+            if t is not None and new not in self._tracks:
+                entry = t.to_dict()
+                self._remove(old)
+                self._add(new, entry)
+
+    # ---------- lookups ----------
+    def get(self, path, default=None):
+        return self._tracks.get(path, default)
+
+    def __contains__(self, path):
+        return path in self._tracks
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __iter__(self):
+        return iter(self._tracks)
+
+    def tracks(self):
+        return self._tracks.values()
+
+    def artists(self):
+        """Artist names that have at least one track."""
+        return list(self._artists)
+
+    def albums(self, artist):
+        """{album: album_id} for artist."""
+        return self._artists.get(artist, {})
+
+    def album_id(self, artist, album):
+        return self._album_ids.get((artist, album))
+
+    def album_key(self, album_id):
+        """(artist, album) for a live album id."""
+        return self._album_keys[album_id]
+
+    def album_tracks(self, album_id):
+        return self._album_tracks.get(album_id, [])
+
+    # ---------- browse order (shared with the persisted browse index) ----------
+    def _name_key(self, name):
+        key = self._name_keys.get(name)
+        if key is None:
+            key = self._name_keys[name] = name_sort_key(name)
+        return key
+
+    def _forget_facet_art(self):
+        """Drop cached facet_art picks after an album's artwork changed."""
+        for key in [k for k in self._orders if isinstance(k, tuple) and k[0] == "facet_art"]:
+            del self._orders[key]
+
+    def _ordered(self, cache_key, names):
+        """names sorted by collation key, cached until an artist/album/facet value comes or goes."""
+        order = self._orders.get(cache_key)
+        if order is None:
+            order = self._orders[cache_key] = sorted(names, key=self._name_key)
+        return order
+
+    def sorted_artists(self):
+        """Artists in browse order. The list is cached: don't modify it."""
+        return self._ordered("artists", self._artists)
+
+    def sorted_albums(self, artist):
+        return self._ordered(("albums", artist), self.albums(artist))
+
+    def artist_art(self, artist):
+        """Artwork of the artist's first album in browse order."""
+        albums = self.sorted_albums(artist)
+        return self.album_art(self.album_id(artist, albums[0])) if albums else ""
+
+    def artist_tracks(self, artist):
+        return [t for album in self.sorted_albums(artist) for t in self.album_tracks(self.album_id(artist, album))]
+
+    def album_art(self, album_id):
+        return self._album_art.get(album_id, "")
+
+    # ---------- browse facets ----------
+    def _album_order(self, album_id):
+        artist, album = self._album_keys[album_id]
+        return self._name_key(album), self._name_key(artist)
+
+    def facet_values(self, facet):
+        """Values of a facet that have tracks, in browse order (years/decades ascending)."""
+        return self._ordered(("facet", facet), self._facets[facet])
+
+    def facet_album_ids(self, facet, value):
+        """Album ids with a track under facet value, ordered by album then artist."""
+        return sorted(self._facets[facet].get(value, ()), key=self._album_order)
+
+    def facet_artists(self, facet, value):
+        artists = {self._album_keys[album_id][0] for album_id in self._facets[facet].get(value, ())}
+        return sorted(artists, key=self._name_key)
+
+    def facet_albums(self, facet, value, artist):
+        """Album names of artist with a track under facet value."""
+        ids = self._facets[facet].get(value, {})
+        return [album for album in self.sorted_albums(artist) if self.album_id(artist, album) in ids]
+
+    def facet_tracks(self, facet, value, album_id):
+        """The album's tracks that are filed under facet value, in album order."""
+        return [t for t in self.album_tracks(album_id) if facet_value(facet, t) == value]
+
+    def facet_art(self, facet, value):
+        """Artwork of the first album (in browse order) under facet value that has some.
+
+        Cached in _orders; dropped when an album joins/leaves the value or its artwork changes.
+        """
+        cache_key = ("facet_art", facet, value)
+        art = self._orders.get(cache_key)
+        if art is None:
+            with_art = [album_id for album_id in self._facets[facet].get(value, ()) if self.album_art(album_id)]
+            art = self._orders[cache_key] = self.album_art(min(with_art, key=self._album_order)) if with_art else ""
+        return art
+
+    def build_search_index(self):
+        """Build the SearchIndex up front; loaders call this off the GUI thread so typing never pays for it."""
+        if self._search is None:
+            self._search = SearchIndex.build(self._tracks.values())
+
+    def search(self, query, limit=200):
+        """Tracks matching query (diacritic-insensitive word prefixes), best first."""
+        self.build_search_index()
+        return [self._tracks[p] for p in self._search.search(query, limit)]
@@ -0,0 +1,111 @@
+# waveform_widget.py — seek bar that draws the track's waveform overview
+import numpy as np
+
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtGui import QPainter, QPixmap, QColor, QPainterPath
+
+
+class WaveformSeekBar(QWidget):
+    """
+    Drop-in for the player's QProgressBar (setValue / value / setRange,
+    0..100 by default) that draws a precomputed peak/RMS overview.
+    The waveform is rendered to two pixmaps (played / unplayed) only when
+    the track or the widget size changes; repaints just blit them.
+    Without an overview it draws a plain rounded bar.
+    """
+
+    PLAYED = QColor("#39ff14")
+    PLAYED_RMS = QColor("#1f8f0b")
+    UNPLAYED = QColor("#2a2a2a")
+    UNPLAYED_RMS = QColor("#444444")
+    BACKGROUND = QColor("#1e1e1e")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self.setMinimumHeight(15)
+        self.setCursor(Qt.PointingHandCursor)
+        self._minimum, self._maximum, self._value = 0, 100, 0
+        self._overview = None
+        self._pixmaps = None
+
+    # ---------- QProgressBar-compatible API ----------
+    def setRange(self, minimum, maximum):
+        self._minimum, self._maximum = minimum, max(minimum + 1, maximum)
+        self.update()
+
+    def setValue(self, value):
+        value = max(self._minimum, min(self._maximum, int(value)))
+        if value != self._value:
+            self._value = value
+            self.update()
+
+    def value(self):
+        return self._value
+
+    def setTextVisible(self, visible):
+        pass
+
+    # ---------- waveform ----------
+    def setWaveform(self, overview):
+        """(bins, 2) uint8 peak/RMS array (e.g. memory-mapped), or None."""
+        self._overview = None if overview is None else np.asarray(overview)
+        self._pixmaps = None
+        self.update()
+
+    def resizeEvent(self, event):
+        self._pixmaps = None
+        super().resizeEvent(event)
+
+    def _columns(self, width):
+        """Resample the overview to one (peak, rms) pair per pixel column, 0..1."""
+        bins = len(self._overview)
+        edges = np.linspace(0, bins, width + 1).astype(np.int64)
+        edges = np.minimum(edges[:-1], bins - 1)
+        peak = np.maximum.reduceat(self._overview[:, 0], edges) / 255.0
+        rms = np.maximum.reduceat(self._overview[:, 1], edges) / 255.0
+        return peak, rms
+
+    def _render(self, fill, fill_rms):
+        pixmap = QPixmap(self.size())
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        w, h = self.width(), self.height()
+        mid = h / 2
+
+        if self._overview is None or not len(self._overview) or w <= 0:
+            path = QPainterPath()
+            path.addRoundedRect(QRectF(0, 0, w, h), 8, 8)
+            painter.fillPath(path, fill)
+        else:
+            peak, rms = self._columns(w)
+            for colour, levels in ((fill, peak), (fill_rms, rms)):
+                painter.setPen(colour)
+                for x, level in enumerate(levels):
+                    half = max(0.5, level * mid)
+                    painter.drawLine(x, int(mid - half), x, int(mid + half))
+        painter.end()
+        return pixmap
+
+    def paintEvent(self, event):
+        if self._pixmaps is None:
+            self._pixmaps = (
+                self._render(self.UNPLAYED, self.UNPLAYED_RMS),
+                self._render(self.PLAYED, self.PLAYED_RMS),
+            )
+        unplayed, played = self._pixmaps
+
+        painter = QPainter(self)
+        if self._overview is None:
+            path = QPainterPath()
+            path.addRoundedRect(QRectF(0, 0, self.width(), self.height()), 8, 8)
+            painter.fillPath(path, self.BACKGROUND)
+        else:
+            painter.drawPixmap(0, 0, unplayed)
+        ratio = (self._value - self._minimum) / (self._maximum - self._minimum)
+        split = int(round(self.width() * ratio))
+        if split > 0:
+            painter.drawPixmap(0, 0, played, 0, 0, split, self.height())
+        painter.end()